@@ -0,0 +1,99 @@
+'''
+columnar on-disk cache of parsed hsr values. each entry stores the value
+matrix column-major as .npy, so it can be memory-mapped and a column read
+touches only that column's pages, with the datetime index and column
+labels alongside. entries are tied to the hsr file's mtime and size and
+are re-parsed when the file changes.
+'''
+
+import hashlib
+import os
+import pickle
+import warnings
+
+import numpy as np
+
+
+# bump whenever make_df output changes, to invalidate cached entries
+CACHE_VERSION = 1
+
+
+class ColumnCache:
+    '''
+    directory of cached hsr frames. layout is
+    cache_dir/hsr-<path and options digest>/{values.npy, index.npy, meta.pkl}
+    where values.npy is (columns, hours), i.e. one contiguous row per column.
+    '''
+
+    def __init__(self, cache_dir):
+        self.cache_dir = cache_dir
+        os.makedirs(cache_dir, exist_ok=True)
+
+    def _entry(self, path, options):
+        '''returns entry directory for hsr path and make_df options'''
+        key = repr((os.path.abspath(path), sorted(options.items())))
+        digest = hashlib.blake2b(key.encode(), digest_size=16).hexdigest()
+        return os.path.join(self.cache_dir, 'hsr-' + digest)
+
+    @staticmethod
+    def signature(path):
+        '''returns (mtime_ns, size) of file, used to detect changes'''
+        stat = os.stat(path)
+        return (stat.st_mtime_ns, stat.st_size)
+
+    def load(self, path, options):
+        '''
+        returns (values, index, header, columns) for hsr path, or None if
+        not cached or stale. values is a copy-on-write memory map of shape
+        (columns, hours), so edits stay in memory; index is int64
+        nanoseconds; header holds the raw column header tuples and columns
+        the final ones (with units).
+        '''
+        entry = self._entry(path, options)
+        try:
+            with open(os.path.join(entry, 'meta.pkl'), 'rb') as f:
+                meta = pickle.load(f)
+            if (meta['version'] != CACHE_VERSION or
+                    meta['signature'] != self.signature(path)):
+                return None
+            values = np.load(os.path.join(entry, 'values.npy'), mmap_mode='c')
+            index = np.load(os.path.join(entry, 'index.npy'))
+        except FileNotFoundError:
+            return None
+        except Exception as e:
+            warnings.warn(
+                "Warning: could not read cached hsr {0}: {1}".format(entry, e))
+            return None
+        if values.shape != (len(meta['columns']), len(index)):
+            return None
+        return values, index, meta['header'], meta['columns']
+
+    def store(self, path, options, signature, values, index, header, columns):
+        '''
+        stores value matrix (hours, columns) column-major with its index and
+        labels. signature is the file's (mtime_ns, size) when it was parsed.
+        failures only warn.
+        '''
+        entry = self._entry(path, options)
+        try:
+            os.makedirs(entry, exist_ok=True)
+            self._write(os.path.join(entry, 'values.npy'),
+                        lambda f: np.save(f, np.ascontiguousarray(values.T)))
+            self._write(os.path.join(entry, 'index.npy'),
+                        lambda f: np.save(f, index))
+            meta = {'version': CACHE_VERSION, 'signature': signature,
+                    'header': header, 'columns': columns}
+            # meta goes last, so it never points at missing arrays
+            self._write(os.path.join(entry, 'meta.pkl'), lambda f: pickle.dump(
+                meta, f, protocol=pickle.HIGHEST_PROTOCOL))
+        except Exception as e:
+            warnings.warn(
+                "Warning: could not write cached hsr {0}: {1}".format(entry, e))
+
+    def _write(self, path, writer):
+        '''writes through temp file and renames, so concurrent readers never
+        see partial files'''
+        tmp = '{0}.{1}.tmp'.format(path, os.getpid())
+        with open(tmp, 'wb') as f:
+            writer(f)
+        os.replace(tmp, path)
@@ -5,75 +5,168 @@ import pandas as pd
 import numpy as np
 import warnings
 import re
+import csv
+from concurrent.futures import ProcessPoolExecutor
+from functools import lru_cache, wraps
 
 try:
     from . import plot
-    from plotly.offline import download_plotlyjs, init_notebook_mode, plot
+    from plotly.offline import download_plotlyjs, init_notebook_mode
 except:
     pass
 
 from . import unit_dict
+from .cache import ColumnCache
+from .rollup import Rollup, day_cube
 
 
-class hsr_df:
-    '''hsr dataframe object.'''
+# hsr files have 10 header lines; rows 4-9 describe columns, data follows
+HEADER_LINES = 10
+
+
+def column_property(method):
+    '''
+    read-only property computed from df columns on first access and cached
+    until df or its columns are replaced
+    '''
+    attr = '_' + method.__name__
 
-    def __init__(self, hsrfile, getunits=True, multicol=True, show_warnings=False):
-        self.df = make_df(hsrfile, getunits=getunits, multicol=multicol)
+    @property
+    @wraps(method)
+    def wrapper(self):
+        cached = self.__dict__.get(attr)
+        if cached is None or cached[0] is not self.df.columns:
+            cached = (self.df.columns, method(self))
+            self.__dict__[attr] = cached
+        return cached[1]
+    return wrapper
+
+
+class hsr_df:
+    '''hsr dataframe object.
+    dtype=np.float32 halves memory of values (eQUEST reports 4-6
+    significant digits). collapse=True moves constant columns out of df
+    into the 'constants' series (column -> value). cache_dir keeps parsed
+    values memory-mapped on disk; see make_df.'''
+
+    def __init__(self, hsrfile, getunits=True, multicol=True, show_warnings=False, usecols=None,
+                 dtype=np.float64, collapse=False, cache_dir=None):
+        self.df = make_df(hsrfile, getunits=getunits, multicol=multicol,
+                          usecols=usecols, dtype=dtype, cache_dir=cache_dir)
+        self.constants = pd.Series(dtype=object)
+        if collapse:
+            self.df, self.constants = collapse_constant(self.df)
         self.name = str(hsrfile).split("\\")[-1].replace(": ]", "")
         self.path = str(hsrfile)
-        self.units = [x[-1] for x in self.df.columns]
-
-        def make_legend(self, long=True):
-            tuplist = [x[-3:-1] for x in self.df.columns]
-            tuplist = [[str(y) for y in x] for x in tuplist]
-
-            if long:
-                col_list = [self.name.replace(
-                    ".hsr", "") + ", " + x[0] + ", " + x[1] for x in tuplist]
-            else:
-                col_list = [x[0] + ", " + x[1] for x in tuplist]
-            return col_list
-
-        def make_cols(self, long=True):
-            if long:
-                cols = [list(x) for x in self.df.columns]
-                cols = [[str(y) for y in x] for x in cols]
-                [col.insert(0, self.name.replace(".hsr", "")) for col in cols]
-
-                cols = [', '.join(col) for col in cols]
-                cols = [x[1:] if x[0] == '/' else x for x in cols]
-                return cols
-            else:
-                cols = [list(x) for x in self.df.columns]
-                cols = [[str(y) for y in x] for x in cols]
-
-                cols = [', '.join(col) for col in cols]
-                cols = [x[1:] if x[0] == '/' else x for x in cols]
-                return cols
-
-        self.cols_short = make_cols(self, long=False)
-        self.cols_long = make_cols(self)
-        self.legend_long = make_legend(self)
-        self.legend_short = make_legend(self, long=False)
+
+    # column labels are derived lazily, as wide files have thousands of
+    # columns and most callers only need df
+    @column_property
+    def units(self):
+        return [x[-1] for x in self.df.columns]
+
+    def make_legend(self, long=True):
+        tuplist = [x[-3:-1] for x in self.df.columns]
+        tuplist = [[str(y) for y in x] for x in tuplist]
+
+        if long:
+            col_list = [self.name.replace(
+                ".hsr", "") + ", " + x[0] + ", " + x[1] for x in tuplist]
+        else:
+            col_list = [x[0] + ", " + x[1] for x in tuplist]
+        return col_list
+
+    def make_cols(self, long=True):
+        if long:
+            cols = [list(x) for x in self.df.columns]
+            cols = [[str(y) for y in x] for x in cols]
+            [col.insert(0, self.name.replace(".hsr", "")) for col in cols]
+
+            cols = [', '.join(col) for col in cols]
+            cols = [x[1:] if x[0] == '/' else x for x in cols]
+            return cols
+        else:
+            cols = [list(x) for x in self.df.columns]
+            cols = [[str(y) for y in x] for x in cols]
+
+            cols = [', '.join(col) for col in cols]
+            cols = [x[1:] if x[0] == '/' else x for x in cols]
+            return cols
+
+    @column_property
+    def cols_short(self):
+        return self.make_cols(long=False)
+
+    @column_property
+    def cols_long(self):
+        return self.make_cols()
+
+    @column_property
+    def legend_long(self):
+        return self.make_legend()
+
+    @column_property
+    def legend_short(self):
+        return self.make_legend(long=False)
+
+    @property
+    def rollups(self):
+        '''Rollup of df (daily, monthly and month-hour tables), cached until
+        df is replaced, so plots and reports share computed tables'''
+        cached = self.__dict__.get('_rollups')
+        if cached is None or cached.df is not self.df:
+            cached = Rollup(self.df)
+            self.__dict__['_rollups'] = cached
+        return cached
+
+    def daily(self, stat='mean'):
+        '''returns daily min/max/mean/sum of all columns, rows are dates'''
+        return self.rollups.daily(stat)
+
+    def monthly(self, stat='sum'):
+        '''returns monthly totals (or min/max/mean) of all columns'''
+        return self.rollups.monthly(stat)
+
+    def profile(self, stat='mean'):
+        '''returns 12x24 month-hour profile of all columns'''
+        return self.rollups.profile(stat)
+
+    def cube(self, calendar=False):
+        '''returns Cube (values, days, columns) of df, where values is a
+        (days, 24, columns) view of df values for numpy reductions, e.g.
+        cube().values.max(axis=1) for daily peaks. see rollup.day_cube for
+        leap years, dayshift and calendar=True'''
+        return day_cube(self.df, calendar=calendar)
+
+    def memory_usage(self):
+        '''returns series of bytes used by values, index, column labels and
+        collapsed constants, and their total'''
+        usage = pd.Series({
+            'values': int(self.df.memory_usage(index=False).sum()),
+            'index': int(self.df.index.memory_usage()),
+            'columns': int(self.df.columns.memory_usage(deep=True)),
+            'constants': int(self.constants.memory_usage(deep=True)),
+        })
+        usage['total'] = usage.sum()
+        return usage
 
     def line(self, **kwargs):
         plot.line(self.df, **kwargs)
 
     def heatmap(self, x, **kwargs):
-        plot.heatmap(self.df, x, **kwargs)
+        plot.heatmap(self.df, x, rollup=self.rollups, **kwargs)
 
     def scatter(self, x, y, **kwargs):
         plot.scatter(self.df, x, y, **kwargs)
 
     def range(self, x, **kwargs):
-        plot.line_dailyrange(self.df, x, **kwargs)
+        plot.line_dailyrange(self.df, x, rollup=self.rollups, **kwargs)
 
     def surface(self, x, **kwargs):
-        plot.surface(self.df, x, **kwargs)
+        plot.surface(self.df, x, rollup=self.rollups, **kwargs)
 
     def hist(self, x, **kwargs):
-        plot.hist(self.df, x, **kwargs)
+        return plot.hist(self.df, x, **kwargs)
 
 
 class HSR_Info:
@@ -90,9 +183,8 @@ class HSR_Info:
         self.path = str(hsrfile)
 
         def make_cols(hsrfile):
-            coldf = make_df(hsrfile, getunits=getunits,
-                            multicol=False, cols_only=True)
-            cols = coldf.T.values.tolist()
+            # header lines only; the data body is never read
+            cols = [list(col) for col in read_columns(hsrfile)]
             [col.insert(0, self.name.replace(".hsr", "")) for col in cols]
 
             return cols
@@ -103,42 +195,110 @@ class HSR_Info:
             pass
 
 
-def dflist_to_colstring(hsr_filelist):
-    '''take list of hsr files, pass strings for preview/filtering'''
-    colstringlist = []
-    for file in hsr_filelist:
-        hsr = HSR_Info(file)
-        colstring = [', '.join(col) for col in hsr.cols]
-        colstringlist.append(colstring)
+def file_colstrings(file):
+    '''returns column strings of one hsr file, for dflist_to_colstring'''
+    hsr = HSR_Info(file)
+    return [', '.join(col) for col in hsr.cols]
+
+
+def map_files(func, args, workers=None):
+    '''
+    applies func to each argument tuple in args, in a process pool of
+    workers processes if workers > 1, returning results in args order.
+    (on windows, scripts using workers need an if __name__ == '__main__'
+    guard.)
+    '''
+    if workers is None or workers <= 1 or len(args) <= 1:
+        return [func(*arg) for arg in args]
+    with ProcessPoolExecutor(max_workers=min(workers, len(args))) as pool:
+        return list(pool.map(func, *zip(*args)))
+
+
+def dflist_to_colstring(hsr_filelist, workers=None):
+    '''take list of hsr files, pass strings for preview/filtering.
+    workers reads file headers in parallel processes'''
+    colstringlist = map_files(file_colstrings, [(file,) for file in hsr_filelist],
+                              workers=workers)
     colstringlist = [item for sublist in colstringlist for item in sublist]
     return colstringlist
 
 
-def filter_string_to_df(folderpath, filterlist):
-    '''take filtered list for multiple hsr files, return to concatenated dataframe'''
+def compile_filter(filterlist, match='substring'):
+    '''
+    compiles filterlist into predicate on column strings. match='exact'
+    looks strings up in a hash set; match='substring' also tests them
+    against one regex alternation of all filters, so matching is one scan
+    per column however many filters there are.
+    '''
+    if match not in ('exact', 'substring'):
+        raise ValueError("match must be 'exact' or 'substring', not {0}".format(match))
+    exact = frozenset(filterlist)
+    if match == 'exact' or len(exact) == 0:
+        return lambda col: col in exact
+    pattern = re.compile('|'.join(
+        re.escape(series) for series in sorted(exact, key=len, reverse=True)))
+    return lambda col: col in exact or pattern.search(col) is not None
+
+
+def filter_file(hsrfile, filterlist, match='substring'):
+    '''
+    loads columns of one hsr file matching filterlist (strings for this
+    file, as from dflist_to_colstring), for filter_string_to_df. each
+    column is returned once, in file order. returns (column strings, index
+    as int64 nanoseconds, values array) rather than a dataframe, so results
+    are cheap to send back from worker processes.
+    '''
+    # compare without the leading file name, which depends on how the
+    # file path was given
+    filterlist = [series.split(', ', 1)[1] if ', ' in series else ''
+                  for series in filterlist]
+    matches = compile_filter(filterlist, match=match)
+
+    # match filters against header first, so only candidate columns are
+    # parsed. filter strings may carry units, which the header lacks
+    unitless = frozenset(series.rsplit(', ', 1)[0] for series in filterlist)
+    colstrings = [', '.join([str(x) for x in col[1:]])
+                  for col in HSR_Info(hsrfile).cols]
+    usecols = [num for num, col in enumerate(colstrings)
+               if matches(col) or col in unitless]
+
+    hsr = hsr_df(hsrfile, multicol=False, usecols=usecols)
+    filt_collist = []
+    filt_poslist = []
+    for num, col in enumerate(hsr.cols_short):
+        if matches(col) or matches(colstrings[usecols[num]]):
+            filt_collist.append(hsr.cols_long[num])
+            filt_poslist.append(num)
+
+    values = hsr.df.values[:, filt_poslist]
+    return filt_collist, hsr.df.index.asi8, values
+
+
+def filter_string_to_df(folderpath, filterlist, workers=None, match='substring'):
+    '''take filtered list for multiple hsr files, return to concatenated dataframe.
+    match='substring' keeps columns containing any filter string, 'exact'
+    only columns equal to one (with or without units); each column is kept
+    once. workers parses files in parallel processes; columns are
+    concatenated in order of each file's first appearance in filterlist
+    either way.'''
 
     if folderpath[-1] != '\\\\' or folderpath[-1] != '/':
         folderpath = folderpath + '/'
 
-    files = list(set([x.split(", ")[0] for x in filterlist]))
+    files = list(dict.fromkeys([x.split(", ")[0] for x in filterlist]))
+
+    # each file only sees its own filter strings
+    filters = {f: [] for f in files}
+    for series in filterlist:
+        filters[series.split(", ")[0]].append(series)
+
+    results = map_files(filter_file, [(folderpath + f + '.hsr', filters[f], match)
+                                      for f in files], workers=workers)
 
     dflist = []
-    for f in files:
-        hsrfile = folderpath + f + '.hsr'
-        #print ("-----****-----")
-        #print (hsrfile)
-        hsr = hsr_df(hsrfile, multicol=False)
-        allcols = hsr.cols_long
-        filterdf = hsr.df
-        filterdf.columns = allcols
-        filt_collist = []
-        for col in allcols:
-            for series in filterlist:
-                if series in col:
-                    filt_collist.append(col)
-
-        filterdf = filterdf.loc[:, filt_collist]
-        dflist.append(filterdf)
+    for filt_collist, index, values in results:
+        dflist.append(pd.DataFrame(values, index=pd.DatetimeIndex(index),
+                                   columns=filt_collist))
 
     concatdf = pd.concat(dflist, axis=1)
     if len(filterlist) != len(concatdf.columns):
@@ -147,112 +307,274 @@ def filter_string_to_df(folderpath, filterlist):
     return concatdf
 
 
-def make_df(fname, year=2019, dayshift=0, getunits=True, multicol=True, novars=True, show_warnings=False, cols_only=False):
-    '''makes and returns pandas dataframe out of hourly results .hsr file'''
+def read_header(fname, nlines=HEADER_LINES, blocksize=2**16):
+    '''
+    reads only the first nlines of hsr file, in blocks until enough line
+    breaks are seen, returns list of fields per line. fields are parsed
+    with csv so quoted names containing commas stay whole; their commas
+    become spaces, as columns get joined with ', '.
+    '''
+    head = b''
+    with open(fname, 'rb') as f:
+        while head.count(b'\n') < nlines:
+            block = f.read(blocksize)
+            if len(block) == 0:
+                break
+            head += block
+    lines = [line.decode('latin-1').rstrip('\r')
+             for line in head.split(b'\n')[:nlines]]
+    rows = list(csv.reader(lines))
+    return [[field.replace(', ', ' ').replace(',', ' ') for field in row]
+            for row in rows]
+
+
+def header_columns(header, novars=True):
+    '''
+    takes header lines from read_header, returns list of column header
+    rows (month/day/hour fields included), with blank fields forward-filled
+    from the left and remaining blanks as nan
+    '''
+    rows = header[4:10]
+    if novars:
+        del rows[4]  # variable number row
 
-    with open(fname, 'r', encoding='latin-1') as f:
-        flist = f.readlines()
-    coldf = pd.DataFrame(flist, columns=['flist'])
-    coldf['flist'] = coldf['flist'].str.replace(', ', ' ')
-    coldf = coldf['flist'].str.split(',', expand=True).iloc[4:10:, :-1]
+    # every line ends with a comma, leaving an empty last field
+    rows = [row[:-1] if len(row) > 0 and row[-1] == '' else row for row in rows]
+    width = max(len(row) for row in rows)
 
-    if novars:
-        coldf = coldf.drop([8])
-    if coldf.iloc[0, -1] == '\n':
-        coldf = coldf.iloc[:, :-1]
-
-    coldf = coldf.replace('', np.nan, regex=True)
-    coldf = coldf.fillna(method='ffill', axis=1)
-    coldf = coldf.replace("\"", "")
-    collist = coldf.values.tolist()
-    collist = [[str(x).replace("\"", "") if type(
-        x) == str else x for x in y] for y in collist]
-    # collist = [[str(x) if np.isnan(x) else x for x in y] for y in collist]
+    collist = []
+    for row in rows:
+        filled = []
+        last = np.nan
+        for field in row + [''] * (width - len(row)):
+            if field != '':
+                last = field
+            filled.append(last)
+        collist.append(filled)
+    return collist
+
+
+def read_columns(fname, novars=True):
+    '''returns list of column header tuples of hsr file (month/day/hour
+    fields excluded), reading header lines only'''
+    collist = header_columns(read_header(fname), novars=novars)
+    return list(zip(*[row[4:] for row in collist]))
+
+
+def read_values(fname, usecols, dtype=np.float64):
+    '''
+    reads numeric body of hsr file straight into float array (of dtype) of
+    the fields at positions usecols (ascending) of each line, with numpy's
+    c loadtxt (numpy >= 1.23) or pandas' c parser. other fields are skipped
+    without conversion, and there are no intermediate string values.
+    '''
+    usecols = list(usecols)
+    if np.lib.NumpyVersion(np.__version__) >= '1.23.0':
+        try:
+            return np.loadtxt(fname, dtype=dtype, delimiter=',',
+                              skiprows=HEADER_LINES, usecols=usecols,
+                              encoding='latin-1', ndmin=2)
+        except ValueError:
+            pass  # blank, ragged or non-numeric fields
+
+    kwargs = dict(skiprows=HEADER_LINES, header=None, usecols=usecols,
+                  encoding='latin-1', engine='c', skip_blank_lines=False)
+    try:
+        return pd.read_csv(fname, dtype=dtype, **kwargs).values
+    except ValueError:
+        # non-numeric entries; parse as text and coerce those to nan
+        valdf = pd.read_csv(fname, dtype=str, **kwargs)
+        return valdf.apply(pd.to_numeric, errors='coerce').values.astype(dtype)
+
+
+@lru_cache(maxsize=64)
+def date_index(year, dayshift, nrows, start=(1, 1, 1)):
+    '''
+    returns hourly DatetimeIndex of nrows hours from (month, day, hour)
+    start of year, shifted by dayshift days. cached, so frames of the same
+    year and length share its values; make_index hands out copies, as index
+    names can be changed in place.
+    '''
+    month, day, hour = start
+    first = pd.Timestamp(year, month, day) + pd.Timedelta(hours=hour)
+    return pd.date_range(first + pd.Timedelta(str(dayshift) + " days"),
+                         periods=nrows, freq='h')
+
+
+def make_index(month, day, hour, year=2019, dayshift=0):
+    '''
+    takes hsr month, day and hour (1-24) fields, returns DatetimeIndex of
+    date + hour hours, shifted by dayshift days. the shared date_range index
+    is used if it matches the fields (checked in one vectorized pass);
+    otherwise (gaps, leap days, etc.) the index is assembled from the fields.
+    '''
+    nrows = len(month)
+    if nrows > 0 and not np.isnan(month[0] + day[0] + hour[0]):
+        start = (int(month[0]), int(day[0]), int(hour[0]))
+        try:
+            index = date_index(year, dayshift, nrows, start)
+        except ValueError:
+            index = None  # invalid start date for year
+        if index is not None:
+            check = index - pd.Timedelta(str(dayshift) + " days") - pd.Timedelta(hours=1)
+            if ((check.month == month) & (check.day == day) &
+                    (check.hour + 1 == hour)).all():
+                return index.copy()  # shallow; values stay shared
+
+    dtcols = pd.DataFrame({'Year': year, 'Month': month,
+                           'Day': day, 'Hour': hour})
+    hsrdatetime = pd.DatetimeIndex(pd.to_datetime(dtcols))
+    return hsrdatetime + pd.Timedelta(str(dayshift) + " days")
+
+
+def column_positions(header, usecols):
+    '''resolves usecols (positions or header tuples) against list of
+    column header tuples, returns sorted positions'''
+    if usecols is None:
+        return list(range(len(header)))
+    return sorted(set(
+        header.index(tuple(col)) if isinstance(col, (tuple, list)) else int(col)
+        for col in usecols))
+
+
+def make_df(fname, year=2019, dayshift=0, getunits=True, multicol=True, novars=True, show_warnings=False, cols_only=False, usecols=None,
+            dtype=np.float64, cache_dir=None):
+    '''
+    makes and returns pandas dataframe out of hourly results .hsr file.
+    usecols limits parsing to a list of columns, given as positions or as
+    header tuples (as returned by read_columns); columns keep file order.
+    dtype sets float type of values, e.g. np.float32 for half the memory.
+    cache_dir stores the parsed values column-major on disk; reopening an
+    unchanged file memory-maps them instead of parsing, and reading a
+    column then only pages in that column.
+    '''
+    if cache_dir is not None and not cols_only:
+        return cached_df(fname, cache_dir, year=year, dayshift=dayshift,
+                         getunits=getunits, novars=novars,
+                         show_warnings=show_warnings, usecols=usecols,
+                         dtype=dtype)
+
+    collist = header_columns(read_header(fname), novars=novars)
 
     if cols_only:
         return pd.DataFrame(collist).iloc[:, 4:]
 
-    valdf = pd.DataFrame(flist[10:], columns=['vals'])
-    valdf = valdf['vals'].str.split(',', expand=True)
-    if valdf.iloc[0, -1] == '\n':
-        valdf = valdf.iloc[:, :-1]
-
-    valdf.columns = collist
-    valdf = valdf
-
-    # make datetime
-    valdf['Year'] = year
-    dtcols = pd.DataFrame([valdf.iloc[:, -1], valdf.iloc[:, 0], valdf.iloc[:, 1],
-                           valdf.iloc[:, 2]]).transpose().astype(float, errors='raise')
-    dtcols.columns = ['Year', 'Month', 'Day', 'Hour']
-    hsrdatetime = pd.to_datetime(dtcols)
-    valdf.index = hsrdatetime
-    valdf = valdf.astype(float, errors='ignore')
-    valdf.index = valdf.index + pd.Timedelta(str(dayshift) + " days")
-    valdf = valdf.iloc[:, 4:-1]
+    positions = column_positions(
+        list(zip(*[row[4:] for row in collist])), usecols)
+    collist = [[row[4 + pos] for pos in positions] for row in collist]
+
+    # month, day and hour fields, then requested columns
+    values = read_values(fname, [0, 1, 2] + [4 + pos for pos in positions],
+                         dtype=dtype)
+
+    hsrdatetime = make_index(values[:, 0], values[:, 1], values[:, 2],
+                             year=year, dayshift=dayshift)
+
+    columns = pd.MultiIndex.from_arrays(collist)
+    valdf = pd.DataFrame(values[:, 3:], index=hsrdatetime, columns=columns)
 
     # change df based on args
     if getunits:
         valdf = get_units(valdf, show_warnings=show_warnings)
 
-    valdf.columns.set_levels([l.fillna('N/A')
-                              for l in valdf.columns.levels], inplace=True)
+    valdf.columns = valdf.columns.set_levels([l.fillna('N/A')
+                                              for l in valdf.columns.levels])
 
     if not multicol:
         pass
     return valdf
 
 
+def cached_df(fname, cache_dir, year=2019, dayshift=0, getunits=True, novars=True,
+              show_warnings=False, usecols=None, dtype=np.float64):
+    '''
+    make_df through ColumnCache. a miss parses and stores every column;
+    a hit builds the frame on the memory-mapped values, zero-copy for all
+    columns, or copying just the usecols columns.
+    '''
+    cache = ColumnCache(cache_dir)
+    options = {'year': year, 'dayshift': dayshift, 'getunits': getunits,
+               'novars': novars, 'dtype': np.dtype(dtype).str}
+
+    cached = cache.load(fname, options)
+    if cached is None:
+        signature = cache.signature(fname)
+        valdf = make_df(fname, year=year, dayshift=dayshift, getunits=getunits,
+                        novars=novars, show_warnings=show_warnings, dtype=dtype)
+        header = read_columns(fname, novars=novars)
+        cache.store(fname, options, signature, valdf.values,
+                    valdf.index.asi8, header, valdf.columns.tolist())
+        if usecols is None:
+            return valdf
+        return valdf.iloc[:, column_positions(header, usecols)]
+
+    values, index, header, columns = cached
+    if usecols is not None:
+        positions = column_positions(header, usecols)
+        values = values[positions]
+        columns = [columns[pos] for pos in positions]
+
+    # values are (columns, hours); the transpose is the frame's own block
+    # layout, so no data is copied or read here
+    return pd.DataFrame(values.T, index=pd.DatetimeIndex(index),
+                        columns=pd.MultiIndex.from_tuples(columns), copy=False)
+
+
+def collapse_constant(df):
+    '''
+    splits columns holding a single value throughout (e.g. all zeros,
+    unused flags, all nan) out of df. returns (df of varying columns,
+    series of constant column -> value)
+    '''
+    if len(df) == 0:
+        return df, pd.Series(dtype=object)
+    values = df.values
+    isnan = np.isnan(values)
+    constant = ((values == values[0]) | isnan).all(axis=0) & (
+        isnan.all(axis=0) | ~isnan.any(axis=0))
+    constants = pd.Series(values[0, constant], index=df.columns[constant])
+    return df.loc[:, ~constant], constants
+
+
+@lru_cache(maxsize=None)
+def unit_index():
+    '''
+    parses unit_dict once, on first use, into series of units indexed by
+    (Type, Name). the first entry wins where the dictionary repeats a key.
+    '''
+    rows = unit_dict.unit_dict.split('\n')[2:]
+    cols = [row.split(',')[:3] for row in rows]
+    cols = [col for col in cols if len(col) == 3]
+    rptdf = pd.DataFrame(cols, columns=['Type', 'Name', 'Units'])
+    rptdf = rptdf.drop_duplicates(['Type', 'Name'])
+    return rptdf.set_index(['Type', 'Name'])['Units']
+
+
 def get_units(df, show_warnings=False):
     '''takes hsr_unit_dict.csv and tries to lookup units. returns
     new partial multiindex tuplelist'''
-    # unitdict = 'hsr_unit_dict.csv'
-    # rptdf = pd.read_csv('./eqparse/hsr/hsr_unit_dict.csv')
-
-    # print (rptdf)
-
-    rows = unit_dict.unit_dict.split('\n')
-
-    cols = [row.split(',') for row in rows]
-    rptdf = pd.DataFrame(cols).iloc[2:, :3]
-    rptdf.columns = ['Type', 'Name', 'Units']
-
-    rpttype = [x[2] for x in df.columns]
-    rptname = [x[4] for x in df.columns]
-    rpt_tup = list(zip(rpttype, rptname))
-
-    unitlist = []
-    for tup in rpt_tup:
-        try:
-            unit = rptdf[(rptdf['Type'] == tup[0]) & (
-                rptdf['Name'] == tup[1])]['Units'].values[0]
-            unitlist.append(unit)
-        except:
-            if show_warnings:
-                warnings.warn(
-                    """"Warning: {0} not found in lookup between .hsr and equest standard report dictionary. consider inspecting/appending hsr_unit_dict.csv located at {1}""".format(tup[1], unitdictfile))
-                unitlist.append('-')
-            else:
-                unitlist.append('-')
-
-    unit_tuples = list(zip(rpttype, rptname, unitlist))
-    for u in unit_tuples:
-        if u[2] == '*':
-            if show_warnings:
-
-                warnings.warn(
-                    """"Warning: units not found in dictionary for {0}. Unit set to "-". Consider inspecting/appending hsr_unit_dict.csvlocated at {1} ("*" val for unit indicates potentital missing unit; "-" val for unit indicates no units likely required.)""".format(str(u[0:2]), str(unitdictfile)))
-
-    # add unitlist of tuples to dataframe
-    unitdf = df.copy()
-    unit_collist = []
-    if len(df.columns) != len(unit_tuples):
-        raise ValueError(
-            "Error: dataframe column length different from unit column length.")
-    for num, col in enumerate(df.columns):
-        tolist = list(col)
-        tolist.append(unit_tuples[num][2])
-        unit_collist.append(tuple(tolist))
-    multi = pd.MultiIndex.from_tuples(unit_collist)
-    unitdf.columns = multi
+    unitdictfile = unit_dict.__file__
+
+    rpttype = df.columns.get_level_values(2)
+    rptname = df.columns.get_level_values(4)
+
+    # one lookup for all columns against the (Type, Name) index
+    units = unit_index().reindex(pd.MultiIndex.from_arrays([rpttype, rptname]))
+    missing = units.isnull().values
+    unitlist = units.fillna('-').tolist()
+
+    if show_warnings:
+        for name in rptname[missing]:
+            warnings.warn(
+                """"Warning: {0} not found in lookup between .hsr and equest standard report dictionary. consider inspecting/appending hsr_unit_dict.csv located at {1}""".format(name, unitdictfile))
+        for num in np.flatnonzero(np.array(unitlist, dtype=object) == '*'):
+            warnings.warn(
+                """"Warning: units not found in dictionary for {0}. Unit set to "-". Consider inspecting/appending hsr_unit_dict.csvlocated at {1} ("*" val for unit indicates potentital missing unit; "-" val for unit indicates no units likely required.)""".format(str((rpttype[num], rptname[num])), str(unitdictfile)))
+
+    # add units level to dataframe columns; shallow copy, as only the
+    # column index changes
+    unitdf = df.copy(deep=False)
+    levels = [df.columns.get_level_values(num)
+              for num in range(df.columns.nlevels)]
+    unitdf.columns = pd.MultiIndex.from_arrays(levels + [unitlist])
     return unitdf
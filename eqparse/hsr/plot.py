@@ -39,7 +39,17 @@ import plotly.graph_objs as go
 from plotly import tools
 import textwrap
 
+from .rollup import Rollup
+
 config = {'editable': True}
+
+# line plots with more points than this (over all traces) use webgl traces
+WEBGL_POINTS = 50000
+
+MONTHS = np.array(['Jan', 'Feb', 'Mar', 'Apr', 'May', 'Jun',
+                   'Jul', 'Aug', 'Sep', 'Oct', 'Nov', 'Dec'])
+HOURS = np.arange(1, 25)
+PERIOD_TITLES = {'day': 'Day of Year', 'week': 'Week', 'month': 'Month'}
 init_notebook_mode(connected=True)
 
 
@@ -57,6 +67,111 @@ def colname_to_int(df, colname):
     return num, name
 
 
+def period_labels(dates, resolution='day'):
+    '''helper function.
+    returns 'Jan-01' style labels of dates ('Jan' for month resolution),
+    built from month and day numbers rather than formatting each date'''
+    months = MONTHS[np.asarray(dates.month) - 1]
+    if resolution == 'month':
+        return months
+    days = np.char.zfill(np.asarray(dates.day).astype(str), 2)
+    return np.char.add(np.char.add(months, '-'), days)
+
+
+def hour_matrices(df, colname, resolution='day', aggfunc='mean', rollup=None):
+    '''helper function.
+    returns (x labels, list of (column name, 24 x periods matrix)) for
+    column or list of columns colname. matrices of all columns come from
+    one pass over the day x hour cube of df, or of rollup (a Rollup of df)
+    if given, and x labels are made once'''
+    if rollup is None:
+        rollup = Rollup(df)
+    colnames = colname if isinstance(colname, list) else [colname]
+    positions = [colname_to_int(df, col) for col in colnames]
+    periods, matrices = rollup.hours(resolution, aggfunc,
+                                     columns=[num for num, _ in positions])
+    return period_labels(periods, resolution), [
+        (name, z) for (_, name), z in zip(positions, matrices)]
+
+
+def plot_positions(index):
+    '''helper function.
+    returns index as float array for point selection, in hours if it is a
+    DatetimeIndex, else positions if it is not numeric'''
+    if isinstance(index, pd.DatetimeIndex):
+        return (index.asi8 - index.asi8[0]) / 3.6e12
+    try:
+        return np.asarray(index, dtype=np.float64)
+    except (TypeError, ValueError):
+        return np.arange(len(index), dtype=np.float64)
+
+
+def lttb(x, y, n):
+    '''returns positions of n points of series x, y picked by
+    largest-triangle-three-buckets, which keeps its visual shape.
+    first and last points are always kept'''
+    size = len(y)
+    if n >= size or n < 3:
+        return np.arange(size)
+
+    # n - 2 buckets between first and last point
+    edges = (np.arange(n - 1) * ((size - 2) / (n - 2))).astype(np.int64) + 1
+    edges[-1] = size - 1
+
+    # mean point of each bucket, and the last point as the one after
+    valid = ~np.isnan(y[:-1])
+    count = np.add.reduceat(valid, edges[:-1])
+    with np.errstate(invalid='ignore', divide='ignore'):
+        avg_x = np.r_[np.add.reduceat(x[:-1], edges[:-1]) /
+                      np.diff(edges), x[-1]]
+        avg_y = np.r_[np.add.reduceat(np.where(valid, y[:-1], 0), edges[:-1]) /
+                      count, y[-1]]
+
+    keep = np.empty(n, dtype=np.int64)
+    keep[0], keep[-1] = 0, size - 1
+    last = 0
+    for num in range(n - 2):
+        start, end = edges[num], edges[num + 1]
+        area = np.abs((x[last] - avg_x[num + 1]) * (y[start:end] - y[last]) -
+                      (x[last] - x[start:end]) * (avg_y[num + 1] - y[last]))
+        area[np.isnan(area)] = -1
+        last = start + int(np.argmax(area))
+        keep[num + 1] = last
+    return keep
+
+
+def minmax(y, n):
+    '''returns positions of about n points of series y: the min and max of
+    each of n / 2 buckets, which keeps every peak. first and last points
+    are always kept'''
+    size = len(y)
+    if n >= size or n < 4:
+        return np.arange(size)
+
+    width = -(-size // (n // 2))
+    nbuckets = -(-size // width)
+    padded = np.full(nbuckets * width, np.nan)
+    padded[:size] = y
+    padded = padded.reshape(nbuckets, width)
+    start = np.arange(nbuckets) * width
+    low = start + np.argmin(np.where(np.isnan(padded), np.inf, padded), axis=1)
+    high = start + np.argmax(np.where(np.isnan(padded), -np.inf, padded), axis=1)
+    keep = np.unique(np.r_[0, low, high, size - 1])
+    return keep[keep < size]
+
+
+def decimate(index, y, max_points, method='lttb'):
+    '''helper function.
+    returns positions of at most max_points points of series y on index,
+    by method 'lttb' (shape) or 'minmax' (envelope of peaks)'''
+    if method == 'lttb':
+        return lttb(plot_positions(index), y, max_points)
+    if method == 'minmax':
+        return minmax(y, max_points)
+    raise ValueError(
+        "decimation must be 'lttb' or 'minmax', not {0}".format(method))
+
+
 def scatter(df,
             x, y, z=False,
             height=700, width=1000,
@@ -133,69 +248,67 @@ def heatmap(df,
             reversescale=False,
             colorscale='RdBu', colorbar_title='Units',
             height=600, width=1000,
-            plot=True, asFigure=False, layoutupdate=False):
+            plot=True, asFigure=False, layoutupdate=False, rollup=None):
     '''take df, x, y, z (optional) columns as integers and
-    return a plotly heatmap'''
+    return a plotly heatmap. resolution 'day', 'week' or 'month' sets the
+    period of each column of the hour of day matrix; aggfunc reduces
+    hours over coarser periods. colname may be a list of columns, which
+    share the matrix work; figures are then returned as a list. rollup
+    (a Rollup of df, as hsr_df.rollups) reuses its cached matrices'''
 
     if type(df) == pd.core.series.Series:
         df = pd.DataFrame(df)
-    x, plt_title = colname_to_int(df, colname)
-    dfpivot = pd.DataFrame(df.loc[:, plt_title])
-    dfpivot['hour'] = dfpivot.index.hour
-    dfpivot['day'] = dfpivot.index.map(lambda x: x.strftime('%b-%d'))
-    dfpivot['week'] = dfpivot.index.week
-    dfpivot['month'] = dfpivot.index.month
-    dfpivot['dayofyear'] = dfpivot.index.dayofyear
-    dfpivot.columns = [''.join(x) for x in dfpivot.columns]
-    dfpivot = dfpivot.pivot_table(values=dfpivot.columns[0], index='hour', columns=[
-                                  'dayofyear', 'week', 'day', 'month'], aggfunc=aggfunc)
-
-    trace = go.Heatmap(
-        x=[x[2] for x in dfpivot.columns],
-        y=dfpivot.index.values,
-        z=dfpivot.values,
-        zsmooth=zsmooth,
-        reversescale=reversescale,
-        colorscale=colorscale,
-        colorbar=dict(title=colorbar_title))
-
-    if zmin != 'default':
-        if zmax == 'default':
-            raise ValueError(
-                "Error: If entering zmin or zmax, BOTH must be specified.")
-        trace.update(zmin=zmin)
-        trace.update(zmax=zmax)
-
-    if plot_title == 'default':
-        title = str(plt_title) + " Annual Heatmap"
-
-    else:
-        title = plot_title
+    xlabels, matrices = hour_matrices(df, colname, resolution, aggfunc, rollup)
+
+    figs = []
+    for plt_title, z in matrices:
+        trace = go.Heatmap(
+            x=xlabels,
+            y=HOURS,
+            z=z,
+            zsmooth=zsmooth,
+            reversescale=reversescale,
+            colorscale=colorscale,
+            colorbar=dict(title=colorbar_title))
+
+        if zmin != 'default':
+            if zmax == 'default':
+                raise ValueError(
+                    "Error: If entering zmin or zmax, BOTH must be specified.")
+            trace.update(zmin=zmin)
+            trace.update(zmax=zmax)
+
+        if plot_title == 'default':
+            title = str(plt_title) + " Annual Heatmap"
+
+        else:
+            title = plot_title
 
-    layout = dict(title=title,
-                  height=height,
-                  width=width)
-
-    data = [trace]
-    fig = dict(data=data, layout=layout)
-    fig['layout'].update({
-        'font': {'family': 'Futura LT BT, monospace', 'size': 14},
-        'title': title,
-        'titlefont': {'size': 24},
-        'xaxis': {'title': 'Day of Year'},
-        'yaxis': {'title': 'Hour of Day'}
-    })
-    if layoutupdate:
-        layout.update(layoutupdate)
+        layout = dict(title=title,
+                      height=height,
+                      width=width)
 
-    if lv(plotly.__version__) >= lv('3.5'):
-        fig['data'][0]['colorbar']['title'].update({'side': 'right'})
-    else:
-        fig['data'][0]['colorbar'].update({'titleside': 'right'})
-    if plot:
-        py.iplot(fig, config=config)
+        data = [trace]
+        fig = dict(data=data, layout=layout)
+        fig['layout'].update({
+            'font': {'family': 'Futura LT BT, monospace', 'size': 14},
+            'title': title,
+            'titlefont': {'size': 24},
+            'xaxis': {'title': PERIOD_TITLES[resolution]},
+            'yaxis': {'title': 'Hour of Day'}
+        })
+        if layoutupdate:
+            layout.update(layoutupdate)
+
+        if lv(plotly.__version__) >= lv('3.5'):
+            fig['data'][0]['colorbar']['title'].update({'side': 'right'})
+        else:
+            fig['data'][0]['colorbar'].update({'titleside': 'right'})
+        if plot:
+            py.iplot(fig, config=config)
+        figs.append(fig)
     if asFigure:
-        return fig
+        return figs if isinstance(colname, list) else figs[0]
 
 
 def surface(df,
@@ -206,74 +319,80 @@ def surface(df,
             reversescale=False,
             colorscale='RdBu', colorbar_title='Units',
             height=600, width=1200,
-            plot=True, asFigure=False, layoutupdate=False):
+            plot=True, asFigure=False, layoutupdate=False, rollup=None):
     '''take df, x, y, z (optional) columns as integers and
-    return a plotly heatmap'''
+    return a plotly surface. resolution 'day', 'week' or 'month' sets the
+    period of each column of the hour of day matrix; aggfunc reduces
+    hours over coarser periods. colname may be a list of columns, which
+    share the matrix work; figures are then returned as a list. rollup
+    (a Rollup of df, as hsr_df.rollups) reuses its cached matrices'''
 
     if type(df) == pd.core.series.Series:
         df = pd.DataFrame(df)
-    x, plt_title = colname_to_int(df, colname)
-
-    dfpivot = pd.DataFrame(df.iloc[:, x])
-    dfpivot['hour'] = dfpivot.index.hour
-    dfpivot['day'] = dfpivot.index.map(lambda x: x.strftime('%b-%d'))
-    dfpivot['week'] = dfpivot.index.week
-    dfpivot['month'] = dfpivot.index.month
-    dfpivot['dayofyear'] = dfpivot.index.dayofyear
-    dfpivot.columns = [''.join(x) for x in dfpivot.columns]
-    dfpivot = dfpivot.pivot_table(values=dfpivot.columns[0], index='hour', columns=[
-                                  'dayofyear', 'week', 'day', 'month'], aggfunc=aggfunc)
-
-    trace = go.Surface(
-        x=[x[2] for x in dfpivot.columns],
-        y=dfpivot.index.values,
-        z=dfpivot.values,
-        reversescale=reversescale,
-        colorscale=colorscale,
-        colorbar=dict(title=colorbar_title))
-
-    if zmin != 'default':
-        if zmax == 'default':
-            raise ValueError(
-                "Error: If entering zmin or zmax, BOTH must be specified.")
-        trace.update(zmin=zmin)
-        trace.update(zmax=zmax)
-
-    if plot_title == 'default':
-        title = str(plt_title) + " Annual Heatmap"
-
-    else:
-        title = plot_title
-
-    layout = dict(title=title,
-                  height=height,
-                  width=width)
+    xlabels, matrices = hour_matrices(df, colname, resolution, aggfunc, rollup)
+
+    figs = []
+    for plt_title, z in matrices:
+        trace = go.Surface(
+            x=xlabels,
+            y=HOURS,
+            z=z,
+            reversescale=reversescale,
+            colorscale=colorscale,
+            colorbar=dict(title=colorbar_title))
+
+        if zmin != 'default':
+            if zmax == 'default':
+                raise ValueError(
+                    "Error: If entering zmin or zmax, BOTH must be specified.")
+            trace.update(zmin=zmin)
+            trace.update(zmax=zmax)
+
+        if plot_title == 'default':
+            title = str(plt_title) + " Annual Heatmap"
+
+        else:
+            title = plot_title
 
-    data = [trace]
-    fig = dict(data=data, layout=layout)
-    fig['layout'].update({
-        'font': {'family': 'Futura LT BT, monospace', 'size': 14},
-        'title': title,
-        'titlefont': {'size': 24},
-        'xaxis': {'title': 'Day of Year'},
-        'yaxis': {'title': 'Hour of Day'}
-    })
-    if layoutupdate:
-        layout.update(layoutupdate)
+        layout = dict(title=title,
+                      height=height,
+                      width=width)
 
-    fig['data'][0]['colorbar'].update({'titleside': 'right'})
-    if plot:
-        py.iplot(fig, config=config)
+        data = [trace]
+        fig = dict(data=data, layout=layout)
+        fig['layout'].update({
+            'font': {'family': 'Futura LT BT, monospace', 'size': 14},
+            'title': title,
+            'titlefont': {'size': 24},
+            'xaxis': {'title': PERIOD_TITLES[resolution]},
+            'yaxis': {'title': 'Hour of Day'}
+        })
+        if layoutupdate:
+            layout.update(layoutupdate)
+
+        if lv(plotly.__version__) >= lv('3.5'):
+            fig['data'][0]['colorbar']['title'].update({'side': 'right'})
+        else:
+            fig['data'][0]['colorbar'].update({'titleside': 'right'})
+        if plot:
+            py.iplot(fig, config=config)
+        figs.append(fig)
     if asFigure:
-        return fig
+        return figs if isinstance(colname, list) else figs[0]
 
 
 def line(df,
          plot_title='Hourly Plot', yaxistitle='units', xaxistitle='Year',
          colorscale='set1',
          width=1200, height=800,
-         plot=True, asFigure=False, layoutupdate=False, autosize=True):
-    '''simple plot for a dataframe. plots all columns.'''
+         plot=True, asFigure=False, layoutupdate=False, autosize=True,
+         max_points=None, decimation='lttb', webgl='auto'):
+    '''simple plot for a dataframe. plots all columns.
+    max_points reduces each trace to at most that many points before
+    plotting, by decimation 'lttb' (largest-triangle-three-buckets, keeps
+    shape) or 'minmax' (min and max of each bucket, keeps peaks).
+    webgl='auto' uses webgl traces when more than WEBGL_POINTS points are
+    plotted; True or False forces either.'''
     try:
         if type(df.columns) == pd.core.index.MultiIndex:
             df.columns = [', '.join(col) for col in df.columns]
@@ -286,13 +405,25 @@ def line(df,
     except:
         if type(df) == pd.Series:
             df = pd.DataFrame(df)
-    data = [go.Scatter(x=df.index,
-                       y=df[col].values,
-                       mode='lines',
-                       name=''.join(
-                           str('<br>'.join(textwrap.wrap(col, width=100)).split(", ")[-3:]))[1:-1],
-                       line=dict(width=1.5))
-            for col in df]
+    npoints = len(df)
+    if max_points is not None:
+        npoints = min(npoints, max_points)
+    if webgl == 'auto':
+        webgl = npoints * len(df.columns) > WEBGL_POINTS
+    trace = go.Scattergl if webgl else go.Scatter
+
+    data = []
+    for col in df:
+        x, y = df.index, df[col].values
+        if max_points is not None and len(y) > max_points:
+            keep = decimate(x, y, max_points, method=decimation)
+            x, y = x[keep], y[keep]
+        data.append(trace(x=x,
+                          y=y,
+                          mode='lines',
+                          name=''.join(
+                              str('<br>'.join(textwrap.wrap(col, width=100)).split(", ")[-3:]))[1:-1],
+                          line=dict(width=1.5)))
 
     if autosize:
         layout = go.Layout(paper_bgcolor='rgba(0,0,0,0)',
@@ -336,19 +467,21 @@ def line_dailyrange(df,
                     colname,
                     plot_title='default',
                     height=600, width=1200,
-                    plot=True, asFigure=False, layoutupdate=False, autosize=False):
-    '''take df and column, return piv df of min max mean'''
+                    plot=True, asFigure=False, layoutupdate=False, autosize=False,
+                    rollup=None):
+    '''take df and column, plot daily min max mean. rollup (a Rollup of
+    df, as hsr_df.rollups) reuses its cached daily tables'''
 
     if type(df) == pd.core.series.Series:
         df = pd.DataFrame(df)
     x, plt_title = colname_to_int(df, colname)
 
-    dfpivot = pd.DataFrame(df.iloc[:, x])
-    dfpivot['dayofyear'] = dfpivot.index.dayofyear
-    dfpivot.columns = ['a', 'b']
-    dfpivot = pd.concat([pd.pivot_table(dfpivot, 'a', 'b', aggfunc='min'), pd.pivot_table(
-        dfpivot, 'a', 'b', aggfunc='max'), pd.pivot_table(dfpivot, 'a', 'b', aggfunc='mean')], axis=1)
+    if rollup is None:
+        rollup = Rollup(df)
+    dfpivot = pd.concat([rollup.daily(stat, columns=[x]).iloc[:, 0]
+                         for stat in ['min', 'max', 'mean']], axis=1)
     dfpivot.columns = ['min', 'max', 'mean']
+    dfpivot.index = dfpivot.index.dayofyear
 
     trace0 = go.Scatter(x=dfpivot.index.values, y=dfpivot['min'].values,
                         fill=None,
@@ -400,6 +533,56 @@ def line_dailyrange(df,
         return fig
 
 
+def series_name(name):
+    '''helper function.
+    returns column name as string, joining multiindex levels'''
+    if isinstance(name, tuple):
+        return ', '.join(str(level) for level in name)
+    return str(name)
+
+
+def hist_edges(df, colname, bins=10, bin_start='default', bin_end='default'):
+    '''returns bin edges bins wide from bin_start (or smallest value) to
+    bin_end (or largest value) of column or list of columns colname, so
+    all columns (runs) are binned alike'''
+    colnames = colname if isinstance(colname, list) else [colname]
+    values = df.iloc[:, [colname_to_int(df, col)[0] for col in colnames]].values
+    values = values[np.isfinite(values)]
+    if bin_start == 'default':
+        bin_start = values.min() if len(values) > 0 else 0
+    if bin_end == 'default':
+        bin_end = values.max() if len(values) > 0 else bin_start
+    nbins = max(1, int(np.ceil((bin_end - bin_start) / bins)))
+    edges = bin_start + bins * np.arange(nbins + 1)
+    edges[-1] = max(edges[-1], bin_end)  # float round-off
+    return edges
+
+
+def hist_table(df, colname, bins=10, bin_start='default', bin_end='default', edges=None):
+    '''returns tidy dataframe (series, bin_start, bin_end, count) of
+    numpy.histogram counts of column or list of columns colname, all on
+    the same edges: edges if given (e.g. from hist_edges over several
+    runs), else hist_edges of these columns. values outside the edges
+    are not counted'''
+    if type(df) == pd.core.series.Series:
+        df = pd.DataFrame(df)
+    if edges is None:
+        edges = hist_edges(df, colname, bins, bin_start, bin_end)
+    edges = np.asarray(edges, dtype=np.float64)
+
+    colnames = colname if isinstance(colname, list) else [colname]
+    tables = []
+    for col in colnames:
+        num, name = colname_to_int(df, col)
+        values = df.iloc[:, num].values
+        counts, _ = np.histogram(values[np.isfinite(values)], bins=edges)
+        tables.append(pd.DataFrame({'series': series_name(name),
+                                    'bin_start': edges[:-1],
+                                    'bin_end': edges[1:],
+                                    'count': counts}))
+    return pd.concat(tables, ignore_index=True)
+
+
 def hist(df,
          colname,
          bins=10,
@@ -412,12 +595,25 @@ def hist(df,
          bin_end='default',
          plot=True,
          asFigure=False,
-         layoutupdate=False):
-    '''df hist plot'''
+         layoutupdate=False,
+         binned=False,
+         edges=None):
+    '''df hist plot.
+    binned=True counts values into bins in python (see hist_table) and
+    plots only the counts, as bar traces; colname may then be a list of
+    columns (e.g. runs), all binned on the same edges, and edges may be
+    given to match other plots. binned plots return the hist_table
+    table, or (figure, table) with asFigure'''
 
     if type(df) == pd.core.series.Series:
         df = pd.DataFrame(df)
 
+    if binned:
+        return binned_hist(df, colname, bins=bins, width=width, height=height,
+                           plot_title=plot_title, bin_start=bin_start,
+                           bin_end=bin_end, plot=plot, asFigure=asFigure,
+                           layoutupdate=layoutupdate, edges=edges)
+
     df_filt = df.copy()
     col, plt_title = colname_to_int(df, colname)
 
@@ -452,3 +648,40 @@ def hist(df,
         py.iplot(fig, config=config)
     if asFigure:
         return fig
+
+
+def binned_hist(df, colname, bins=10, width=800, height=500, plot_title='Hourly Plot',
+                bin_start='default', bin_end='default', plot=True, asFigure=False,
+                layoutupdate=False, edges=None):
+    '''hist with binned=True: bar traces of hist_table counts'''
+    table = hist_table(df, colname, bins=bins, bin_start=bin_start,
+                       bin_end=bin_end, edges=edges)
+
+    groups = list(table.groupby('series', sort=False))
+    data = [go.Bar(x=(group['bin_start'] + group['bin_end']).values / 2,
+                   y=group['count'].values,
+                   width=(group['bin_end'] - group['bin_start']).values,
+                   name=series,
+                   opacity=0.6 if len(groups) > 1 else 1)
+            for series, group in groups]
+
+    if plot_title == 'default':
+        title = groups[0][0] + " Histogram" if len(groups) == 1 else "Histogram"
+    else:
+        title = plot_title
+
+    layout = dict(title=title,
+                  height=height,
+                  width=width,
+                  barmode='overlay',
+                  bargap=0)
+
+    fig = dict(data=data, layout=layout)
+
+    if layoutupdate:
+        layout.update(layoutupdate)
+    if plot:
+        py.iplot(fig, config=config)
+    if asFigure:
+        return fig, table
+    return table
@@ -0,0 +1,282 @@
+'''
+temporal rollups of hourly hsr frames: daily, monthly, month-hour (12x24)
+and day-hour tables of min/max/mean/sum for many columns at once. rows
+are grouped once per period into contiguous runs, and each statistic is
+reduced over all columns at once (over a reshaped view where groups are
+of equal size), rather than by a pivot_table per column. hsr timestamps
+are hour-ending (hour 24 of a day is stamped 00:00 of the next), so rows
+are grouped by the hour they end, which keeps hour 24 in its own day and
+month.
+'''
+
+from collections import namedtuple
+
+import numpy as np
+import pandas as pd
+
+
+HOUR = 3600 * 10**9
+DAY = 24 * HOUR
+
+PERIODS = ('day', 'month', 'monthhour', 'dayhour')
+STATS = ('min', 'max', 'mean', 'sum')
+RESOLUTIONS = ('day', 'week', 'month')
+
+Cube = namedtuple('Cube', ['values', 'days', 'columns'])
+
+
+def day_labels(days):
+    '''returns DatetimeIndex of dates for day numbers since epoch'''
+    return pd.DatetimeIndex(np.asarray(days).astype('datetime64[D]'),
+                            name='date')
+
+
+def period_codes(index, period):
+    '''
+    returns (int64 group code per row, function turning unique codes into
+    row labels) for DatetimeIndex and period
+    '''
+    if period not in PERIODS:
+        raise ValueError("period must be one of {0}, not {1}".format(
+            PERIODS, period))
+    if not isinstance(index, pd.DatetimeIndex):
+        raise TypeError("rollups need a DatetimeIndex, not {0}".format(
+            type(index).__name__))
+
+    ending = index.asi8 - HOUR
+    day = ending // DAY
+    hour = (ending - day * DAY) // HOUR  # 0-23, i.e. hour ending 1-24
+
+    if period == 'day':
+        return day, day_labels
+    if period == 'dayhour':
+        return day * 24 + hour, lambda codes: pd.MultiIndex.from_arrays(
+            [day_labels(codes // 24), codes % 24 + 1], names=['date', 'hour'])
+
+    month = day.astype('datetime64[D]').astype('datetime64[M]').astype(
+        np.int64)
+    if period == 'month':
+        return month, lambda codes: pd.DatetimeIndex(
+            codes.astype('datetime64[M]'), name='month')
+    return (month % 12) * 24 + hour, lambda codes: pd.MultiIndex.from_arrays(
+        [codes // 24 + 1, codes % 24 + 1], names=['month', 'hour'])
+
+
+def group_rows(codes):
+    '''
+    returns (row order or None if rows are already grouped, start of each
+    group in ordered rows, unique codes)
+    '''
+    order = None
+    if len(codes) > 1 and (codes[1:] < codes[:-1]).any():
+        order = np.argsort(codes, kind='stable')
+        codes = codes[order]
+    starts = np.flatnonzero(np.r_[True, codes[1:] != codes[:-1]]) if len(
+        codes) > 0 else np.zeros(0, dtype=np.int64)
+    return order, starts, codes[starts]
+
+
+def reduce_groups(values, starts, stat):
+    '''
+    reduces (rows, columns) values, ordered so groups are contiguous, over
+    groups beginning at starts. nan values are skipped; groups of only nan
+    give nan (0 for sum). groups of equal size (whole days of hours, etc.)
+    are reduced on a (groups, size, columns) reshaped view of values.
+    '''
+    if len(starts) == 0:
+        return np.zeros((0, values.shape[1]), dtype=values.dtype)
+    sizes = np.diff(np.r_[starts, len(values)])
+    if (sizes == sizes[0]).all():
+        values = values.reshape(len(starts), sizes[0], values.shape[1])
+
+        def reduce(ufunc, array):
+            return ufunc.reduce(array, axis=1)
+    else:
+        # one reduce per group; reduceat over the row axis is much slower
+        bounds = list(zip(starts, np.r_[starts[1:], len(values)]))
+
+        def reduce(ufunc, array):
+            return np.stack([ufunc.reduce(array[start:end], axis=0)
+                             for start, end in bounds])
+
+    if stat == 'min':
+        return reduce(np.fmin, values)
+    if stat == 'max':
+        return reduce(np.fmax, values)
+
+    isnan = np.isnan(values)
+    if not isnan.any():
+        total = reduce(np.add, values)
+        count = sizes[:, None]
+    else:
+        total = reduce(np.add, np.where(isnan, 0, values))
+        count = reduce(np.add, ~isnan)
+    if stat == 'sum':
+        return total
+    with np.errstate(invalid='ignore', divide='ignore'):
+        return (total / count).astype(values.dtype)
+
+
+def aggregate(values, starts, stat):
+    '''
+    reduce_groups for stat in STATS; any other pandas groupby aggregation
+    is computed through pandas
+    '''
+    if stat in STATS:
+        return reduce_groups(values, starts, stat)
+    groupnum = np.repeat(np.arange(len(starts)),
+                         np.diff(np.r_[starts, len(values)]))
+    return pd.DataFrame(values).groupby(groupnum).agg(stat).values
+
+
+def day_cube(df, calendar=False):
+    '''
+    returns Cube of hourly frame: values as (days, 24, columns) array,
+    days as DatetimeIndex of dates and columns as df columns. hours are
+    hour-ending, so values[d, h] is hour h + 1 of date days[d].
+
+    by default rows must be whole days (hours 1-24 of each date, in
+    order), and values is a reshaped view of df values, with no copy (for
+    single-dtype frames). day labels are the dates in the index, so
+    dayshift moves them and a leap year run (where the hsr file has no feb
+    29) skips feb 29; the cube has one entry per day in the file either
+    way. calendar=True instead copies values into
+    one entry per calendar day from first to last date, with nan for
+    missing days and hours (feb 29 of a leap year, partial days).
+    '''
+    codes, _ = period_codes(df.index, 'dayhour')
+    values = df.values
+    ncols = values.shape[1]
+
+    if calendar:
+        first = codes.min() // 24 if len(codes) > 0 else 0
+        ndays = codes.max() // 24 - first + 1 if len(codes) > 0 else 0
+        cube = np.full((ndays * 24, ncols), np.nan, dtype=values.dtype)
+        cube[codes - first * 24] = values
+        return Cube(cube.reshape(ndays, 24, ncols),
+                    day_labels(np.arange(first, first + ndays)), df.columns)
+
+    if len(codes) % 24 != 0 or (codes[::24] % 24 != 0).any() or (
+            codes.reshape(-1, 24) - codes[::24, None] != np.arange(24)).any():
+        raise ValueError(
+            "rows are not whole days of hours 1-24; "
+            "use calendar=True to pad them")
+    return Cube(values.reshape(-1, 24, ncols), day_labels(codes[::24] // 24),
+                df.columns)
+
+
+class Rollup:
+    '''
+    rollups of an hourly frame, cached per (period, stat, columns). row
+    grouping is computed once per period and shared by all statistics.
+    a table for a subset of columns is sliced from the all-columns table
+    when that has been computed. tables are returned as copies; the
+    cube and hour matrices are returned as read-only arrays, as they can
+    be as large as df.
+    '''
+
+    def __init__(self, df):
+        self.df = df
+        self._groups = {}
+        self._tables = {}
+        self._cube = None
+        self._hours = {}
+
+    def groups(self, period):
+        '''returns (row order, group starts, row labels) for period'''
+        if period not in self._groups:
+            codes, labels = period_codes(self.df.index, period)
+            order, starts, unique = group_rows(codes)
+            self._groups[period] = (order, starts, labels(unique))
+        return self._groups[period]
+
+    def get(self, period='day', stat='mean', columns=None):
+        '''
+        returns dataframe of stat over period for columns (positions, all
+        if None). period is 'day', 'month', 'monthhour' (12x24 rows of
+        month, hour) or 'dayhour' (rows of date, hour); hours are 1-24.
+        stat is 'min', 'max', 'mean' or 'sum', or any other pandas groupby
+        aggregation (computed through pandas).
+        '''
+        key = (period, stat, None if columns is None else tuple(columns))
+        if key in self._tables:
+            return self._tables[key].copy()
+        if columns is not None and (period, stat, None) in self._tables:
+            table = self._tables[(period, stat, None)]
+            return table.iloc[:, list(columns)].copy()
+
+        order, starts, labels = self.groups(period)
+        df = self.df if columns is None else self.df.iloc[:, list(columns)]
+        values = df.values
+        if order is not None:
+            values = values[order]
+
+        table = pd.DataFrame(aggregate(values, starts, stat), index=labels,
+                             columns=df.columns)
+        self._tables[key] = table
+        return table.copy()
+
+    def cube(self):
+        '''day_cube of df, padded to whole calendar days if it has partial
+        days. values are read-only'''
+        if self._cube is None:
+            try:
+                cube = day_cube(self.df)
+            except ValueError:
+                cube = day_cube(self.df, calendar=True)
+            cube.values.flags.writeable = False
+            self._cube = cube
+        return self._cube
+
+    def hours(self, resolution='day', stat='mean', columns=None):
+        '''
+        returns (period start dates, array of shape (columns, 24, periods))
+        of hour of day by period matrices, as for heatmaps, for columns
+        (positions, all if None). resolution 'day' gives the cube's values
+        as they are; 'week' (7 day blocks from the first day) and 'month'
+        reduce each hour of day over the days of the period with stat.
+        the array is read-only (a view of df values for 'day'); copy it to
+        edit it.
+        '''
+        if resolution not in RESOLUTIONS:
+            raise ValueError("resolution must be one of {0}, not {1}".format(
+                RESOLUTIONS, resolution))
+        key = (resolution, stat if resolution != 'day' else None,
+               None if columns is None else tuple(columns))
+        if key in self._hours:
+            return self._hours[key]
+
+        cube = self.cube()
+        values = cube.values
+        if columns is not None:
+            values = values[:, :, list(columns)]
+        ndays, _, ncols = values.shape
+        if resolution == 'day' or ndays == 0:
+            periods = cube.days
+        else:
+            if resolution == 'week':
+                codes = np.arange(ndays) // 7
+            else:
+                codes = cube.days.values.astype('datetime64[M]').astype(
+                    np.int64)
+            _, starts, _ = group_rows(codes)
+            values = aggregate(values.reshape(ndays, 24 * ncols), starts, stat)
+            values = values.reshape(len(starts), 24, ncols)
+            periods = cube.days[starts]
+
+        values = values.transpose(2, 1, 0)
+        values.flags.writeable = False
+        self._hours[key] = (periods, values)
+        return self._hours[key]
+
+    def daily(self, stat='mean', columns=None):
+        '''daily stat table, rows are dates'''
+        return self.get('day', stat, columns)
+
+    def monthly(self, stat='sum', columns=None):
+        '''monthly stat table (totals by default), rows are month starts'''
+        return self.get('month', stat, columns)
+
+    def profile(self, stat='mean', columns=None):
+        '''12x24 month-hour profile, rows are (month, hour)'''
+        return self.get('monthhour', stat, columns)
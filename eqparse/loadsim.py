@@ -29,17 +29,26 @@ class LoadSim:
     Main entry-point for eqparse module. 
     Can pass in sim file or hourly file or just general extensionless name, e.g.
     "Prop.SIM", "Prop.hsr", "Prop" will all work.
+    memoize=True caches parsed sim reports, so convenience functions that
+    reuse the same reports (annual_summaries, tidy_enduses) parse them once.
+    cache_dir persists parsed sim reports and hsr values to disk for reuse
+    across sessions.
+    reports/exclude limit which sim report families are loaded, e.g.
+    reports=['BEPS', 'BEPU', 'ES-E'].
     '''
 
-    def __init__(self, file, hsr=True, inpfile=None):
+    def __init__(self, file, hsr=True, inpfile=None, memoize=False, cache_dir=None,
+                 reports=None, exclude=None):
         file = file.replace('.SIM', '').replace('.hsr', '')
         self.fname = file.split("\\")[-1].split("/")[-1]
-        self.sim = RptHandler(file + '.SIM')
+        self.sim = RptHandler(file + '.SIM', memoize=memoize,
+                              cache_dir=cache_dir, reports=reports,
+                              exclude=exclude)
         self.path = os.path.dirname(file)
 
         if hsr:
             try:
-                self.hsr = hsr_df(file + '.hsr')
+                self.hsr = hsr_df(file + '.hsr', cache_dir=cache_dir)
             except:
                 print(
                     "HSR validation failed. Check eQUEST component names for commas or other special characters.")
@@ -505,4 +514,9 @@ class LoadSim:
         return cost_df
 
     def simrpt(self, listofsims, rpt):
-        return pd.concat([RptHandler(sim) for sim in listofsims], axis=0)
+        '''concatenates report rpt (e.g. 'beps') of each sim file'''
+        dflist = []
+        for sim in listofsims:
+            with RptHandler(sim) as handler:
+                dflist.append(getattr(handler, rpt)())
+        return pd.concat(dflist, axis=0)
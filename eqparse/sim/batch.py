@@ -17,7 +17,8 @@ def beps(folder, dest = None, write = True):
     for sim in sims:
     
         sname = sim.split('\\')[-1].replace('.SIM','')
-        beps = sim_parse.RptHandler(sim).beps()
+        with sim_parse.RptHandler(sim) as handler:
+            beps = handler.beps()
         
         utils = get_utils(beps.index)
         
@@ -150,9 +151,8 @@ def cost(folder, dest = None, write = True):
     
     for sim in sims:
         sname = sim.split('\\')[-1].replace('.SIM','')
-        sim = sim_parse.RptHandler(sim)
-        
-        ese_annual = make_annual_cost(sim)
+        with sim_parse.RptHandler(sim) as handler:
+            ese_annual = make_annual_cost(handler)
         
         
         
@@ -0,0 +1,134 @@
+'''
+persistent on-disk cache of parsed sim reports. entries are keyed by a hash
+of the sim file contents, the report method and its arguments, and
+PARSER_VERSION, so re-run sim files or parser changes never return stale
+tables. dataframes are stored as parquet when pyarrow is available and the
+frame round-trips cleanly; everything else is pickled.
+'''
+
+import hashlib
+import json
+import os
+import pickle
+import warnings
+
+import pandas as pd
+
+try:
+    import pyarrow
+except ImportError:
+    pyarrow = None
+
+
+# bump whenever report parsing output changes, to invalidate cached tables
+PARSER_VERSION = 2
+
+
+def file_hash(path, blocksize=2**24):
+    '''returns hex digest of file contents, read in blocks'''
+    digest = hashlib.blake2b(digest_size=16)
+    with open(path, 'rb') as f:
+        for block in iter(lambda: f.read(blocksize), b''):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def parquet_safe(df):
+    '''
+    true if df round-trips through parquet unchanged: unique string column
+    names, and object columns/index holding only strings (parquet would turn
+    nan into None, and can't store mixed or list values).
+    '''
+    if pyarrow is None or not isinstance(df, pd.DataFrame):
+        return False
+    if isinstance(df.columns, pd.MultiIndex) or not df.columns.is_unique:
+        return False
+    if not all(isinstance(col, str) for col in df.columns):
+        return False
+    if df.index.dtype == object:
+        if not all(isinstance(x, str) for x in df.index):
+            return False
+    for col in df.columns:
+        series = df[col]
+        if series.dtype == object:
+            if not series.map(lambda x: isinstance(x, str)).all():
+                return False
+    return True
+
+
+class ReportCache:
+    '''
+    directory of cached report results. layout is
+    cache_dir/<sim content hash>/<method>-<args digest>-v<PARSER_VERSION>.<ext>
+    plus cache_dir/hashes/<path digest>.json per sim path, which remembers
+    its content hash by mtime and size so unchanged sim files aren't
+    re-hashed on every open. each path has its own file, so handlers on
+    different sim files never rewrite each other's entries.
+    '''
+
+    def __init__(self, cache_dir):
+        self.cache_dir = cache_dir
+        self._hashdir = os.path.join(cache_dir, 'hashes')
+        os.makedirs(self._hashdir, exist_ok=True)
+
+    def sim_hash(self, path, signature):
+        '''returns content hash of sim file; signature is (mtime_ns, size)'''
+        path = os.path.abspath(path)
+        hashfile = os.path.join(self._hashdir, hashlib.blake2b(
+            path.encode(), digest_size=16).hexdigest() + '.json')
+        try:
+            with open(hashfile) as f:
+                known = json.load(f)
+            if known[0] == path and tuple(known[1:3]) == tuple(signature):
+                return known[3]
+        except (OSError, ValueError, IndexError, TypeError):
+            pass
+
+        simhash = file_hash(path)
+        self._write(hashfile, lambda f: f.write(json.dumps(
+            [path, signature[0], signature[1], simhash]).encode()))
+        return simhash
+
+    def _entry(self, simhash, key):
+        '''returns entry path without extension for memo key'''
+        method = key[0]
+        args = hashlib.blake2b(repr(key[1:]).encode(),
+                               digest_size=8).hexdigest()
+        return os.path.join(self.cache_dir, simhash,
+                            '{0}-{1}-v{2}'.format(method, args, PARSER_VERSION))
+
+    def get(self, simhash, key):
+        '''returns (found, result) for memo key'''
+        entry = self._entry(simhash, key)
+        try:
+            if pyarrow is not None and os.path.exists(entry + '.parquet'):
+                return True, pd.read_parquet(entry + '.parquet')
+            if os.path.exists(entry + '.pkl'):
+                with open(entry + '.pkl', 'rb') as f:
+                    return True, pickle.load(f)
+        except Exception as e:
+            warnings.warn(
+                "Warning: could not read cached report {0}: {1}".format(entry, e))
+        return False, None
+
+    def put(self, simhash, key, result):
+        '''stores result for memo key; failures only warn'''
+        entry = self._entry(simhash, key)
+        try:
+            os.makedirs(os.path.dirname(entry), exist_ok=True)
+            if parquet_safe(result):
+                self._write(entry + '.parquet', result.to_parquet)
+            else:
+                self._write(entry + '.pkl', lambda f: pickle.dump(
+                    result, f, protocol=pickle.HIGHEST_PROTOCOL))
+        except Exception as e:
+            warnings.warn(
+                "Warning: could not write cached report {0}: {1}".format(entry, e))
+
+    def _write(self, path, writer):
+        '''writes through temp file and renames, so concurrent readers never
+        see partial entries'''
+        tmp = '{0}.{1}.tmp'.format(path, os.getpid())
+        with open(tmp, 'wb') as f:
+            writer(f)
+        os.replace(tmp, path)
@@ -0,0 +1,401 @@
+'''
+sim file scanner. locates every report page by byte offset in a single
+pass so report text only gets decoded and split when a parser asks for it.
+'''
+
+import bz2
+import gzip
+import lzma
+import mmap
+import os
+import re
+from collections import namedtuple
+from collections.abc import Mapping, Sequence
+
+import numpy as np
+
+
+ReportSpan = namedtuple(
+    'ReportSpan', ['top', 'bottom', 'start', 'end', 'pages'])
+
+ReportBlock = namedtuple('ReportBlock', ['report', 'object', 'lines'])
+
+_title_pat = re.compile(rb'REPORT-.*WEATHER')
+
+
+def report_title(report):
+    '''splits a report title (text between 'REPORT-' and 'WEATHER')
+    into top-level report name and object name'''
+    report = report.replace("REPORT- ", "").replace("WEATHER", "").strip()
+
+    # handle special parse cases
+    special = ["LS-J Daylight Illuminance Frequency",
+               "LS-M Daylight Illuminance Ref Pnt 1",
+               "SS-P Heating Performance Summary of",
+               "SS-P Cooling Performance Summary of",
+               "SS-Q Heat Pump Cooling Summary for",
+               "SS-Q Heat Pump Heating Summary for"]
+
+    if "DESIGN DAY" in report:
+        top = re.split(r'\s{2,}', report)[0] + ' (DESIGN DAY)'
+        try:
+            bottom = re.split(r'\s{2,}', report)[1]
+            if bottom == "":
+                bottom = 'None'
+        except IndexError:
+            bottom = 'None'
+        return top, bottom
+
+    for top in special:
+        if top in report:
+            return top, report.replace((top + " "), "")
+
+    top = re.split(r'\s{2,}', report)[0]
+    try:
+        bottom = re.split(r'\s{2,}', report)[1]
+        if bottom == "":
+            bottom = 'None'
+    except IndexError:
+        bottom = 'None'
+    return top, bottom
+
+
+def report_selector(reports=None, exclude=None):
+    '''
+    returns predicate on report names for scan_reports, or None to keep
+    everything. reports/exclude are lists of report families matched as
+    prefixes with hyphens removed and case ignored, e.g. 'BEPS', 'ES-E',
+    or 'LS' for every LS report. hourly report pages match 'HOURLY'.
+    '''
+    if reports is None and exclude is None:
+        return None
+
+    def normalize(names):
+        if isinstance(names, str):
+            names = [names]
+        return tuple(name.replace("-", "").upper() for name in names)
+
+    include = normalize(reports) if reports is not None else None
+    exclude = normalize(exclude) if exclude is not None else ()
+
+    def select(top):
+        name = top.replace("-", "").upper()
+        if include is not None and not name.startswith(include):
+            return False
+        return not (exclude and name.startswith(exclude))
+    return select
+
+
+def scan_reports(buf, encoding='latin-1', select=None, hourly=None):
+    '''
+    single pass over sim file bytes. returns ordered dictionary of
+    {top: {bottom: [(start, end), ...]}}, one (start, end) byte span
+    per page of report body (i.e. everything after the title and
+    dashed lines, up to the form feed ending the page). if select is
+    given, pages of reports it rejects are skipped and not recorded.
+    if hourly is a list, (start, end) spans of HOURLY REPORT pages are
+    also appended to it.
+    '''
+    selected = {}
+    index = {}
+    size = len(buf)
+    pagestart = 0
+    while pagestart <= size:
+        pageend = buf.find(b'\f', pagestart)
+        if pageend == -1:
+            pageend = size
+
+        page = parse_page(buf, pagestart, pageend, encoding, select, selected)
+        if page is not None:
+            top, bottom, bodystart, ishourly = page
+            index.setdefault(top, {}).setdefault(
+                bottom, []).append((bodystart, pageend))
+            if ishourly and hourly is not None:
+                hourly.append((bodystart, pageend))
+
+        pagestart = pageend + 1
+    return index
+
+
+def parse_page(buf, pagestart, pageend, encoding='latin-1', select=None,
+               selected=None):
+    '''
+    finds report title of page buf[pagestart:pageend]. returns
+    (top, bottom, bodystart, hourly), or None for pages without a report
+    title or rejected by select. selected memoizes select results by
+    report name. hourly report pages are selected as 'HOURLY REPORT'.
+    '''
+    rptstart = buf.find(b'REPORT', pagestart, pageend)
+    if rptstart == -1:
+        return None
+    title = _title_pat.search(buf, rptstart, pageend)
+    if title is None:
+        return None
+
+    top, bottom = report_title(title.group().decode(encoding))
+    hourly = buf[max(rptstart - 7, pagestart):rptstart] == b'HOURLY '
+    if select is not None:
+        name = 'HOURLY REPORT' if hourly else top
+        if selected is None:
+            selected = {}
+        if name not in selected:
+            selected[name] = select(name)
+        if not selected[name]:
+            return None
+
+    # skip report title line and dashed line below it
+    bodystart = pageend + 1
+    first = buf.find(b'\n', rptstart, pageend)
+    if first != -1:
+        second = buf.find(b'\n', first + 1, pageend)
+        if second != -1:
+            bodystart = second + 1
+    return top, bottom, bodystart, hourly
+
+
+def open_stream(source):
+    '''
+    returns (binary file object, close flag) for a path or open binary
+    file. paths ending in .gz, .bz2 or .xz are decompressed on the fly;
+    compressed file objects (gzip.open etc.) can be passed directly.
+    '''
+    if hasattr(source, 'read'):
+        return source, False
+    path = os.fspath(source)
+    openers = {'.gz': gzip.open, '.bz2': bz2.open, '.xz': lzma.open}
+    opener = openers.get(os.path.splitext(path)[1].lower(), open)
+    return opener(path, 'rb'), True
+
+
+def iter_reports(source, encoding='latin-1', select=None, chunksize=2**20):
+    '''
+    streams sim report text from a path, binary file or compressed stream,
+    reading chunksize bytes at a time. yields ReportBlock(report, object,
+    lines) for each run of consecutive pages of the same report and
+    object, with lines as in txtdict, so memory is bounded by the largest
+    single report rather than the file. select is a report name predicate
+    as made by report_selector.
+    '''
+    f, close = open_stream(source)
+    try:
+        selected = {}
+        current = None
+        pages = []
+        pending = b''
+        eof = False
+        while not eof:
+            chunk = f.read(chunksize)
+            if isinstance(chunk, str):
+                raise TypeError("iter_reports needs a binary file, got text")
+            eof = len(chunk) == 0
+            pending += chunk
+
+            # hand off every complete page; last one waits for more data
+            pagestart = 0
+            while True:
+                pageend = pending.find(b'\f', pagestart)
+                if pageend == -1:
+                    if not eof:
+                        break
+                    pageend = len(pending)
+
+                page = parse_page(pending, pagestart, pageend, encoding,
+                                  select, selected)
+                if page is not None:
+                    top, bottom, bodystart = page[:3]
+                    if current is not None and current != (top, bottom):
+                        yield _report_block(current, pages, encoding)
+                        pages = []
+                    current = (top, bottom)
+                    if bodystart <= pageend:
+                        # pages keep their form feed, as in txtdict
+                        pages.append(pending[bodystart:pageend + 1])
+
+                pagestart = pageend + 1
+                if pagestart > len(pending):
+                    break
+            pending = pending[pagestart:]
+
+        if current is not None:
+            yield _report_block(current, pages, encoding)
+    finally:
+        if close:
+            f.close()
+
+
+def _report_block(title, pages, encoding):
+    '''decodes page bodies of one report block into ReportBlock'''
+    lines = []
+    for page in pages:
+        lines += [line[:-1] if line.endswith('\r') else line
+                  for line in page.decode(encoding).split('\n')]
+    return ReportBlock(title[0], title[1], lines)
+
+
+def open_sim(path):
+    '''memory-maps sim file read-only, returns buffer. the file handle is
+    closed straight away, as the mapping doesn't need it; empty files
+    can't be mapped and come back as empty bytes.'''
+    with open(path, 'rb') as f:
+        try:
+            return mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        except ValueError:
+            return b''
+
+
+def close_buffer(buf):
+    '''closes buffer from open_sim (empty bytes have nothing to close)'''
+    if hasattr(buf, 'close'):
+        buf.close()
+
+
+def line_starts(buf, chunksize=2**24):
+    '''returns int64 array of the byte offset of every line start in buf,
+    scanning in chunks so no file-sized temporary arrays are created'''
+    starts = [np.zeros(1, dtype=np.int64)]
+    for offset in range(0, len(buf), chunksize):
+        chunk = np.frombuffer(buf[offset:offset + chunksize], dtype=np.uint8)
+        starts.append(np.flatnonzero(chunk == 10).astype(np.int64) + offset + 1)
+    return np.concatenate(starts)
+
+
+def report_lines(buf, linestarts, spans, encoding='latin-1'):
+    '''
+    maps report body spans onto file line offsets, returns SimLines.
+    each page keeps its trailing form feed on its last line (the final
+    page of a file has none, so its last line is empty).
+    '''
+    size = len(buf)
+    startlist = []
+    endlist = []
+    for start, end in spans:
+        if start > end:
+            continue
+        first = np.searchsorted(linestarts, start)
+        last = np.searchsorted(linestarts, end, side='right')
+        starts = linestarts[first:last]
+        if len(starts) == 0 or starts[0] != start:
+            starts = np.concatenate([[start], starts])
+        ends = np.empty_like(starts)
+        ends[:-1] = starts[1:] - 1
+        ends[-1] = min(end + 1, size)
+        startlist.append(starts)
+        endlist.append(ends)
+
+    if len(startlist) == 0:
+        return SimLines(buf, np.zeros(0, dtype=np.int64), np.zeros(0, dtype=np.int64), encoding)
+
+    starts = np.concatenate(startlist)
+    ends = np.concatenate(endlist)
+
+    # drop carriage returns of crlf line endings
+    view = np.frombuffer(buf, dtype=np.uint8) if size else np.zeros(0, np.uint8)
+    check = ends > starts
+    crlf = np.zeros(len(ends), dtype=bool)
+    crlf[check] = view[ends[check] - 1] == 13
+    ends[crlf] -= 1
+    del view
+    return SimLines(buf, starts, ends, encoding)
+
+
+class SimLines(Sequence):
+    '''
+    list-like sequence of report lines backed by the sim file buffer and
+    arrays of line start/end offsets. lines are decoded to str only when
+    indexed or iterated; slicing returns another SimLines.
+    '''
+
+    def __init__(self, buf, starts, ends, encoding='latin-1'):
+        self._buf = buf
+        self.starts = starts
+        self.ends = ends
+        self.encoding = encoding
+
+    def __len__(self):
+        return len(self.starts)
+
+    def __getitem__(self, key):
+        if isinstance(key, slice):
+            return SimLines(self._buf, self.starts[key], self.ends[key], self.encoding)
+        return self._buf[self.starts[key]:self.ends[key]].decode(self.encoding)
+
+    def __iter__(self):
+        buf = self._buf
+        encoding = self.encoding
+        for start, end in zip(self.starts.tolist(), self.ends.tolist()):
+            yield buf[start:end].decode(encoding)
+
+    def __add__(self, other):
+        if isinstance(other, SimLines) and other._buf is self._buf:
+            return SimLines(self._buf, np.concatenate([self.starts, other.starts]),
+                            np.concatenate([self.ends, other.ends]), self.encoding)
+        return self.tolist() + list(other)
+
+    def __eq__(self, other):
+        if isinstance(other, (SimLines, list)):
+            return self.tolist() == list(other)
+        return NotImplemented
+
+    __hash__ = None
+
+    def __repr__(self):
+        return repr(self.tolist())
+
+    def tolist(self):
+        return list(self)
+
+    def fixed_width(self, width):
+        '''returns (lines, width) uint8 array of raw line bytes, each line
+        truncated or space-padded to width, for fixed-width column slicing'''
+        arr = np.full((len(self), width), 32, dtype=np.uint8)
+        if len(self) == 0 or width == 0:
+            return arr
+        view = np.frombuffer(self._buf, dtype=np.uint8)
+        lengths = np.minimum(self.ends - self.starts, width)
+        for col in range(int(lengths.max())):
+            rows = np.flatnonzero(lengths > col)
+            arr[rows, col] = view[self.starts[rows] + col]
+        del view
+        return arr
+
+
+def concat_lines(linelist):
+    '''concatenates SimLines sharing the same buffer into one SimLines'''
+    first = linelist[0]
+    return SimLines(first._buf,
+                    np.concatenate([lines.starts for lines in linelist]),
+                    np.concatenate([lines.ends for lines in linelist]),
+                    first.encoding)
+
+
+def catalog_rows(index):
+    '''flattens scanned index into list of ReportSpan records'''
+    rows = []
+    for top, bottoms in index.items():
+        for bottom, spans in bottoms.items():
+            rows.append(ReportSpan(top, bottom, spans[0][0], spans[-1][1],
+                                   len(spans)))
+    return rows
+
+
+class ReportText(Mapping):
+    '''
+    read-only {top: {bottom: lines}} view over scanned report offsets.
+    lines come back as SimLines, decoded only as parsers read them.
+    '''
+
+    def __init__(self, buf, linestarts, index, encoding='latin-1'):
+        self._buf = buf
+        self._linestarts = linestarts
+        self._index = index
+        self.encoding = encoding
+
+    def __getitem__(self, top):
+        return {bottom: report_lines(self._buf, self._linestarts, spans, self.encoding)
+                for bottom, spans in self._index[top].items()}
+
+    def __iter__(self):
+        return iter(self._index)
+
+    def __len__(self):
+        return len(self._index)
@@ -2,12 +2,21 @@
 sim table parser
 '''
 
+import copy
+import inspect
+import os
 import re
 import time
+from collections import namedtuple
+from functools import lru_cache, wraps
 import numpy as np
 import pandas as pd
 
 from .plot import SimPlot
+from .reader import (open_sim, close_buffer, line_starts, scan_reports, report_selector,
+                     catalog_rows, concat_lines, report_lines, ReportText,
+                     iter_reports)
+from .cache import ReportCache, file_hash
 
 
 months = ['JAN', 'FEB', 'MAR', 'APR', 'MAY', 'JUN',
@@ -37,6 +46,50 @@ def try_numeric(df):
     return df
 
 
+def coerce_numeric(series):
+    '''
+    vectorized numeric conversion of a report column, handling DOE-2 quirks:
+    trailing '.F' on temperatures, values wrapped in parentheses, and
+    '-nan' / '****' overflow fields (which become nan)
+    '''
+    if series.dtype != object:
+        return pd.to_numeric(series, errors='coerce')
+    cleaned = series.astype(str).str.strip()
+    cleaned = cleaned.str.replace(r'^\((.*)\)$', r'\1', regex=True)
+    cleaned = cleaned.str.replace(r'\.F$', '', regex=True)
+    return pd.to_numeric(cleaned, errors='coerce')
+
+
+def apply_schema(df, schema):
+    '''
+    converts report columns to their declared dtypes in one pass. schema maps
+    column name to 'float64', 'float32', 'int', 'category' or 'string'.
+    'int' columns come out int64, or float64 if any value is missing or
+    fractional;
+    'string' columns hold str values (nan where blank). columns not in
+    schema, or in schema but not in df, are left alone.
+    '''
+    for col, dtype in schema.items():
+        if col not in df.columns:
+            continue
+        series = df[col]
+        if dtype in ('float64', 'float32'):
+            df[col] = coerce_numeric(series).astype(dtype)
+        elif dtype == 'int':
+            series = coerce_numeric(series)
+            if series.notnull().all() and (series % 1 == 0).all():
+                series = series.astype('int64')
+            df[col] = series
+        elif dtype == 'category':
+            df[col] = series.astype('category')
+        elif dtype == 'string':
+            df[col] = series.where(series.isnull(), series.astype(str))
+        else:
+            raise ValueError(
+                "Error: unknown schema dtype '{0}' for column {1}".format(dtype, col))
+    return df
+
+
 def str_to_new_col(df, col, text, newcol):
     '''finds textstr in col of df, puts it into newcol'''
     if type(text) == str:
@@ -95,85 +148,340 @@ def add_normalization(df, numerator, denominator, replacecolstr, newcolstr, repl
     return df
 
 
+def strip_fields(block, encoding):
+    '''
+    takes (rows, width) uint8 array of fixed-width fields, returns (list of
+    fields stripped of whitespace, as by bytes.strip, and bool array of
+    blank fields). the kept bytes of all fields are gathered, each followed
+    by a newline, and decoded and split in one step.
+    '''
+    rows, width = block.shape
+    if rows == 0:
+        return [], np.zeros(0, dtype=bool)
+    flat = np.empty(rows * width + 1, dtype=np.uint8)
+    chars = flat[:-1].reshape(rows, width)
+    chars[:] = block
+    flat[-1] = ord('\n')
+
+    # whitespace is space and \t\n\v\f\r
+    text = chars > 32
+    control = chars < 32
+    if control.any():
+        text |= control & ((chars < 9) | (chars > 13))
+    lead = text.argmax(axis=1)
+    blank = ~text[np.arange(rows), lead]
+    sizes = width - text[:, ::-1].argmax(axis=1) - lead
+    sizes[blank] = 0
+
+    # index of each kept byte in flat, with the newline after each field
+    counts = sizes + 1
+    ends = np.cumsum(counts)
+    index = np.repeat(np.arange(rows) * width + lead - ends + counts,
+                      counts) + np.arange(ends[-1])
+    index[ends - 1] = rows * width
+    fields = flat[index].tobytes().decode(encoding).split('\n')[:-1]
+    return fields, blank
+
+
+class ColSpec:
+    '''
+    fixed-width column layout compiled from a '%' column pattern, where each
+    '%' marks the start of a field. fields are sliced out of all lines of a
+    report at once from the raw sim bytes rather than row by row.
+    '''
+
+    def __init__(self, colpat):
+        self.colpat = colpat
+        self.positions = [i for i, letter in enumerate(colpat) if letter == '%']
+        self.fields = list(zip(self.positions[:-1], self.positions[1:]))
+        self.width = self.positions[-1] if len(self.positions) > 0 else 0
+
+    def extract(self, lines):
+        '''takes SimLines, returns 2d object array of stripped fields
+        (one column per field); blank fields are nan. fields are stripped
+        and decoded a whole column at a time'''
+        mat = lines.fixed_width(self.width)
+        fields = np.empty((len(lines), len(self.fields)), dtype=object)
+        for num, (start, end) in enumerate(self.fields):
+            if end == start:
+                fields[:, num] = np.nan
+                continue
+            values, blank = strip_fields(mat[:, start:end], lines.encoding)
+            fields[:, num] = values
+            fields[blank, num] = np.nan
+        return fields
+
+
+@lru_cache(maxsize=None)
+def colspec(colpat):
+    '''returns compiled ColSpec for colpat, compiling only once per pattern'''
+    return ColSpec(colpat)
+
+
+@lru_cache(maxsize=None)
+def hourly_columns(header):
+    '''
+    takes tuple of the 7 column header lines of an hourly report page,
+    returns list of column names. hourly pages of the same report repeat
+    their header, so names are parsed once per report.
+    '''
+    spacingrow = header[-1]
+
+    # attempt to add delimeters by both "----( 7)" and "----302-". other conditions?
+    spacingrow = spacingrow.replace(
+        "----(", "%---(").replace("----", "%--(")
+
+    poslist = [i for i, letter in enumerate(spacingrow) if letter == '%']
+    poslist.append(len(spacingrow))
+
+    parsed_cols = [[col[start:end].strip() for start, end in
+                    zip(poslist[:-1], poslist[1:])] for col in header]
+    return ['_'.join(x).replace('__', '_').replace("----( ", "(")
+            for x in zip(*parsed_cols)]
+
+
+# hourly data rows start with a month/day/hour stamp, blank-padded (' 1 1 1')
+hourly_stamp = re.compile(r'[ \d]{5}\d(\s|$)')
+
+
+def hourly_index(month, day, hour, year=2021):
+    '''
+    takes arrays of sim month, day and hour (1-24, hour ending), returns
+    DatetimeIndex of date + hour hours. contiguous runs (the usual case) are
+    built with date_range; anything else is assembled from the components.
+    '''
+    if len(month) == 0:
+        return pd.DatetimeIndex([])
+    index = pd.date_range(pd.Timestamp(year, month[0], day[0]) +
+                          pd.Timedelta(hours=int(hour[0])),
+                          periods=len(month), freq='h')
+    shifted = index - pd.Timedelta(hours=1)
+    if ((shifted.month == month) & (shifted.day == day) &
+            (shifted.hour + 1 == hour)).all():
+        return index
+    dates = pd.to_datetime(pd.DataFrame(
+        {'year': year, 'month': month, 'day': day}))
+    return pd.DatetimeIndex(dates + pd.to_timedelta(hour, unit='h'))
+
+
+ReportCacheInfo = namedtuple('ReportCacheInfo', ['hits', 'misses', 'currsize'])
+
+
+def defensive_copy(obj):
+    '''copies memoized report results so callers can't alter cached ones'''
+    if isinstance(obj, (pd.DataFrame, pd.Series)):
+        return obj.copy()
+    if isinstance(obj, tuple):
+        return tuple(defensive_copy(x) for x in obj)
+    return copy.deepcopy(obj)
+
+
+def memoize_report(method):
+    '''
+    decorator for RptHandler report methods. when the handler was created
+    with memoize=True, results are cached by method name and arguments and
+    copies are returned. with a cache_dir, results are also persisted to
+    disk and reused by later handlers on the same sim file contents.
+    otherwise the report is parsed on every call.
+    '''
+    signature = inspect.signature(method)
+
+    @wraps(method)
+    def wrapper(self, *args, **kwargs):
+        if not self.memoize and self._cache is None:
+            return method(self, *args, **kwargs)
+
+        self._check_stale()
+        bound = signature.bind(self, *args, **kwargs)
+        bound.apply_defaults()
+        key = (method.__name__,) + tuple(bound.arguments.items())[1:]
+        try:
+            hash(key)
+        except TypeError:
+            return method(self, *args, **kwargs)
+
+        if self.memoize and key in self._memo:
+            self._hits += 1
+            return defensive_copy(self._memo[key])
+
+        found = False
+        if self._cache is not None:
+            # 'File' columns hold the path, so it is part of the disk key,
+            # as are reports/exclude lists, which can leave objects out
+            diskkey = key + (('path', self.path),)
+            if self._select is not None:
+                diskkey += (('reports', self.reports),
+                            ('exclude', self.exclude))
+            found, result = self._cache.get(self.content_hash(), diskkey)
+        if not found:
+            result = method(self, *args, **kwargs)
+            if self._cache is not None:
+                self._cache.put(self.content_hash(), diskkey, result)
+
+        if not self.memoize:
+            return result
+        self._misses += 1
+        self._memo[key] = result
+        return defensive_copy(result)
+    return wrapper
+
+
 class RptHandler:
     '''container for customized report dataframes, can pass on various metadata
     into it (zone/volume, etc) and transformation methods'''
 
-    def __init__(self, path):
+    def __init__(self, path, encoding='latin-1', memoize=False, cache_dir=None,
+                 reports=None, exclude=None):
         self.path = path
-        self.plot = SimPlot(self)  # exposes 'plot.py' for Sim files
-
-        def _sim_to_text_dict(self):
-            '''parses sim file, returns dictionary of tables and sub tables'''
-            with open(self.path) as f:
-                fstr = f.read()
-            fstr = fstr + '\f'
-            rpt_text = re.findall(r'(REPORT.*?\f)', fstr, re.DOTALL)
-
-            # handle tables
-            rptdict = {}
-            for r in rpt_text:
-                report = re.findall("REPORT-.*WEATHER", r)[0]
-
-                report = report.replace(
-                    "REPORT- ", "").replace("WEATHER", "").strip()
-
-                # handle special parse cases
-
-                if "DESIGN DAY" in report:
-                    top = re.split(r'\s{2,}', report)[0] + ' (DESIGN DAY)'
-                    try:
-                        bottom = re.split(r'\s{2,}', report)[1]
-                        if bottom == "":
-                            bottom = 'None'
-                    except:
-                        bottom = 'None'
-
-                elif "LS-J Daylight Illuminance Frequency" in report:
-                    top = "LS-J Daylight Illuminance Frequency"
-                    bottom = report.replace((top + " "), "")
-
-                elif "LS-M Daylight Illuminance Ref Pnt 1" in report:
-                    top = "LS-M Daylight Illuminance Ref Pnt 1"
-                    bottom = report.replace((top + " "), "")
-
-                elif "SS-P Heating Performance Summary of" in report:
-                    top = "SS-P Heating Performance Summary of"
-                    bottom = report.replace((top + " "), "")
-
-                elif "SS-P Cooling Performance Summary of" in report:
-                    top = "SS-P Cooling Performance Summary of"
-                    bottom = report.replace((top + " "), "")
-                elif "SS-Q Heat Pump Cooling Summary for" in report:
-                    top = "SS-Q Heat Pump Cooling Summary for"
-                    bottom = report.replace((top + " "), "")
-
-                elif "SS-Q Heat Pump Heating Summary for" in report:
-                    top = "SS-Q Heat Pump Heating Summary for"
-                    bottom = report.replace((top + " "), "")
-
-                else:
-                    top = re.split(r'\s{2,}', report)[0]
-                    try:
-                        bottom = re.split(r'\s{2,}', report)[1]
-                        if bottom == "":
-                            bottom = 'None'
-                    except:
-                        bottom = 'None'
-                # rptdata = r.split("\n")[3:] # changed on 2020-01-30 for lv-d
-                rptdata = r.split("\n")[2:]
-                # populate dictionaries
-                if top not in rptdict:
-                    rptdict[top] = {bottom: rptdata}
-
-                else:
-                    if bottom in rptdict[top]:
-                        rptdict[top][bottom] = rptdict[top][bottom] + rptdata
-                    else:
-                        rptdict[top].update({bottom: rptdata})
-            return rptdict
+        self.encoding = encoding
+
+        # optional allow/deny lists of report families (e.g. ['BEPS', 'ES-E']);
+        # other reports are skipped by the scanner and never indexed
+        self.reports = reports
+        self.exclude = exclude
+        self._select = report_selector(reports, exclude)
+
+        # opt-in memo of parsed reports, and optional on-disk cache of
+        # them; see memoize_report
+        self.memoize = memoize
+        self._memo = {}
+        self._hits = 0
+        self._misses = 0
+        self._cache = ReportCache(cache_dir) if cache_dir is not None else None
+
+        self._load()
+
+    @property
+    def plot(self):
+        '''exposes 'plot.py' for Sim files. made on access, so the handler
+        holds no reference to itself and its map is freed with it'''
+        return SimPlot(self)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def _load(self):
+        '''maps sim file. report offsets are scanned on first use, so
+        reports served from the disk cache never touch the text.'''
+        stat = os.stat(self.path)
+        self._signature = (stat.st_mtime_ns, stat.st_size)
+        self._hash = None
+
+        # sim file is memory-mapped rather than read into memory. a single
+        # pass records report offsets and line starts; report text is
+        # decoded lazily through txtdict when parsers request it.
+        self._buf = open_sim(self.path)
+        self._index = None
+
+    def _scan(self):
+        '''scans report offsets and line starts, once per load'''
+        if self._index is not None:
+            return
+        self._linestarts = line_starts(self._buf)
+        self._hourly = []
+        self._index = scan_reports(
+            self._buf, encoding=self.encoding, select=self._select,
+            hourly=self._hourly)
+        self._txtdict = ReportText(
+            self._buf, self._linestarts, self._index, self.encoding)
+        self._build_aliases()
+
+    @property
+    def txtdict(self):
+        '''{report: {object: lines}} of sim file report text'''
+        self._scan()
+        return self._txtdict
+
+    def content_hash(self):
+        '''returns hash of sim file contents used to key the disk cache'''
+        if self._hash is None:
+            if self._cache is not None:
+                self._hash = self._cache.sim_hash(self.path, self._signature)
+            else:
+                self._hash = file_hash(self.path)
+        return self._hash
+
+    def close(self):
+        '''releases memory map of sim file, also on leaving a with block.
+        otherwise the map is freed with its last reference (the handler or
+        a txtdict taken from it)'''
+        close_buffer(self._buf)
+
+    def _check_stale(self):
+        '''if sim file has changed on disk (mtime or size), remaps it and
+        drops memoized reports'''
+        stat = os.stat(self.path)
+        if (stat.st_mtime_ns, stat.st_size) != self._signature:
+            # old map is left to its remaining references (txtdicts taken
+            # before the reload) rather than closed under them
+            self._memo.clear()
+            self._load()
+
+    def cache_info(self):
+        '''returns hits, misses and current size of memoized reports'''
+        return ReportCacheInfo(self._hits, self._misses, len(self._memo))
+
+    def cache_clear(self):
+        '''drops memoized reports and resets hit/miss counts'''
+        self._memo.clear()
+        self._hits = 0
+        self._misses = 0
+
+    def catalog(self):
+        '''returns dataframe of reports and objects available in sim file,
+        with byte offsets of report bodies and page counts'''
+        self._scan()
+        catalog = pd.DataFrame(catalog_rows(self._index),
+                               columns=['Report', 'Object', 'Start', 'End', 'Pages'])
+        catalog['File'] = self.path
+        return catalog
+
+    def iter_reports(self, chunksize=2**20):
+        '''
+        streams (report, object, lines) blocks from the sim file without
+        mapping or indexing it; honors reports/exclude lists. see
+        reader.iter_reports for streaming from other files or streams.
+        '''
+        return iter_reports(self.path, encoding=self.encoding,
+                            select=self._select, chunksize=chunksize)
 
-        self.txtdict = _sim_to_text_dict(self)
+    def _build_aliases(self):
+        '''
+        builds normalized report name index once per handler: full report
+        names and report codes (e.g. 'LV-C Details of Space', 'LVC') with
+        hyphens removed and uppercased, mapped to txtdict keys
+        '''
+        self._normalized = [(top.replace("-", "").upper(), top)
+                            for top in self._index.keys()]
+        self._aliases = {}
+        for norm, top in self._normalized:
+            self._aliases.setdefault(norm, top)
+        for norm, top in self._normalized:
+            code = norm.split(" ")[0]
+            if code not in self._aliases:
+                self._aliases[code] = self._report_key(code)
+
+    def _report_key(self, report):
+        '''
+        resolves report name to txtdict key, via alias index or by prefix.
+        ambiguous prefixes resolve to the first matching report in the sim
+        file. prefix lookups are cached, so each name is resolved only once.
+        '''
+        self._scan()
+        find = report.replace("-", "").upper()
+        if find in self._aliases:
+            return self._aliases[find]
+
+        key = None
+        for norm, top in self._normalized:
+            if norm.startswith(find):
+                key = top
+                break
+        self._aliases[find] = key
+        return key
 
     def _make_dirty_rpt_list(self, report):
         '''
@@ -182,15 +490,17 @@ class RptHandler:
         LV-C Details of Space
         returns dirty list
         '''
-        rptlist = [key for key in self.txtdict.keys()]
-        for rpt in rptlist:
-            find = report.replace("-", "").upper()
-            rpt_fmt = rpt.replace("-", "").upper()
-            pattern = "^" + find + ".*"
-
-            match = re.search(pattern, rpt_fmt)
-            if match:
-                return self.txtdict[rpt]
+        key = self._report_key(report)
+        if key is not None:
+            return self.txtdict[key]
+        self._check_selected(report)
+
+    def _check_selected(self, report):
+        '''raises ValueError if report was left out by reports/exclude lists'''
+        if self._select is not None and not self._select(report):
+            raise ValueError(
+                "report '{0}' not loaded; check RptHandler reports/exclude "
+                "lists ({1}, {2})".format(report, self.reports, self.exclude))
 
     def _make_dirty_rpt_df(self, rptname, colpat, colnames=None, fullname=None):
         '''
@@ -202,34 +512,23 @@ class RptHandler:
         'rpt' = unmet, rpt_ref = 'beps'
         '''
         txtlist = self._make_dirty_rpt_list(rptname)
-        poslist = [i for i, letter in enumerate(colpat) if letter == '%']
+        spec = colspec(colpat)
 
-        dflist = []
-        for key, value in txtlist.items():  #
-            collist = []
-            this_row = []
-            for row in value:
-                this_row = []
-                for num in range(len(poslist)):
-                    try:
-                        this_row_col = row[poslist[num]                                           :poslist[num + 1]].strip()
-                        this_row.append(this_row_col)
-                    except:
-                        pass
-                this_row = [x if len(x) > 0 else np.nan for x in this_row]
-                collist.append(this_row)
-            if colnames is not None:
-                df = pd.DataFrame(collist, columns=colnames)
-            df = df.dropna(how='all')
-            df['Object'] = key
-
-            #     return df
-            dflist.append(df)
+        # extract every object's lines in one pass, then split by object
+        keys = list(txtlist.keys())
+        counts = [len(txtlist[key]) for key in keys]
+        fields = spec.extract(concat_lines([txtlist[key] for key in keys]))
+
+        df_concat = pd.DataFrame(fields, index=np.concatenate(
+            [np.arange(count) for count in counts]))
+        if colnames is not None:
+            df_concat.columns = colnames
+        notblank = df_concat.notnull().any(axis=1).values
+        df_concat['Object'] = np.repeat(np.array(keys, dtype=object), counts)
+        df_concat = df_concat[notblank]
 
-        df_concat = pd.concat(dflist)
         if fullname is not None:
             df_concat.index.name = fullname
-        df_concat = df_concat.apply(pd.to_numeric, errors='ignore')
         return df_concat
 
     def _make_dirty_rpt_df_large_num_reports(self, rptname, colpat, colnames=None, fullname=None):
@@ -241,14 +540,7 @@ class RptHandler:
         taken from 'beps'report;
         'rpt' = unmet, rpt_ref = 'beps'
         '''
-        rptlist = [key for key in self.txtdict.keys()]
-        for rpt in rptlist:
-            find = rptname.replace("-", "").upper()
-            rpt_fmt = rpt.replace("-", "").upper()
-            pattern = "^" + find + ".*"
-            match = re.search(pattern, rpt_fmt)
-            if match:
-                rpt_dict = self.txtdict[rpt]
+        rpt_dict = self._make_dirty_rpt_list(rptname)
         poslist = [i for i, letter in enumerate(colpat) if letter == '%']
         pos_startlist = [i for i, letter in enumerate(colpat) if letter == '%']
         pos_endlist = [i + 1 for i in pos_startlist]
@@ -266,6 +558,7 @@ class RptHandler:
 
     # report dataframes
 
+    @memoize_report
     def lvd(self):
         lvd_cols = ['Surface',
                     'Window U-Val',
@@ -286,9 +579,14 @@ class RptHandler:
         lvd['Space'] = lvd['Space'].apply(
             lambda x: str(x).replace("in space: ", ""))
         lvd['File'] = self.path
-        lvd = try_numeric(lvd)
+
+        lvd_dtypes = dict.fromkeys(lvd_cols[1:-1], 'float64')
+        lvd_dtypes.update(dict.fromkeys(
+            ['Surface', 'Azimuth', 'Space', 'Object', 'File'], 'string'))
+        lvd = apply_schema(lvd, lvd_dtypes)
         return lvd
 
+    @memoize_report
     def psf(self, leedpivot=False):
 
         # psf_col_pat = '%            %------  %------  %------  %------  %------  %------  %------  %------  %------  %------  %------  %------  %------%'
@@ -326,7 +624,6 @@ class RptHandler:
         psf['Cons_Demand'] = psf['Value'].apply(
             lambda x: "Demand" if "MAX" in x else "Consumption")
         psf['File'] = self.path
-        psf = try_numeric(psf)
 
         # handle 'totals' being set to 'december'.
         objlist = list(set((psf['Object'].values)))
@@ -343,7 +640,10 @@ class RptHandler:
             except:
                 pass
 
-        psf = try_numeric(psf)
+        psf_dtypes = dict.fromkeys(psf_cols[1:], 'float64')
+        psf_dtypes.update(dict.fromkeys(
+            ['Value', 'Month', 'Cons_Demand', 'Object', 'File'], 'string'))
+        psf = apply_schema(psf, psf_dtypes)
 
         if leedpivot:
             demand = psf[psf['Cons_Demand'] ==
@@ -357,6 +657,7 @@ class RptHandler:
         else:
             return psf
 
+    @memoize_report
     def ssr(self):
         ssr_col_pat = '%---------------  %------ %------- %------- %-------      %---  %---  %---  %---  %---  %---  %---  %---  %---  %---  %---  %--%'
         ssr_cols = ['ZONE',
@@ -395,10 +696,13 @@ class RptHandler:
         ssr = ssr.loc[ssr['ZONE OF MAXIMUM CLG DEMAND (HOURS)'].notnull(), :]
         ssr['File'] = self.path
 
-        ssr = try_numeric(ssr)
+        ssr_dtypes = dict.fromkeys(ssr_cols[1:], 'int')
+        ssr_dtypes.update(dict.fromkeys(['ZONE', 'Object', 'File'], 'string'))
+        ssr = apply_schema(ssr, ssr_dtypes)
 
         return ssr
 
+    @memoize_report
     def ssl(self):
         ssl_col_pat = '%-----  %------------%-----------%-----------%-----------%   ----% ----% ----% ----% ----% ----% ----% ----% ----% ----% ----% -----%'
         ssl_cols = ['MONTH',
@@ -442,9 +746,11 @@ class RptHandler:
         ssl['File'] = self.path
         ssl = ssl[ssl.MONTH.isin(isinlist)]
 
-        ssl = try_numeric(ssl)
+        ssl_dtypes = dict.fromkeys(ssl_cols[1:5], 'float64')
+        ssl_dtypes.update(dict.fromkeys(ssl_cols[5:], 'int'))
+        ssl_dtypes.update(dict.fromkeys(['MONTH', 'Object', 'File'], 'string'))
+        ssl = apply_schema(ssl, ssl_dtypes)
         ssl = ssl.set_index('MONTH', drop=True)
-        ssl = try_numeric(ssl)
 
         # total fan from detailed simulation reports summary, for convenience
         ssl['Total Fan'] = ssl['FAN ELEC DURING HEATING (KWH)'] + ssl['FAN ELEC DURING COOLING (KWH)'] + \
@@ -452,6 +758,7 @@ class RptHandler:
             ssl['FAN ELEC DURING HEAT & COOL KWH)']
         return ssl
 
+    @memoize_report
     def psh(self):
         '              MON  PEAK   (KBTU/HR)   (KBTU/HR)   (KBTU/HR)   (KBTU/HR)       10    20    30    40    50    60    70    80    90   100    +  HOURS'
         psh_col_pat = '%--  %---  %-------  %-------  ---%---  %-------  %------%    %---  %---  %---  %---  %---  %---  %---  %---  %---  %---  %---  %--%'
@@ -487,9 +794,15 @@ class RptHandler:
         psh = filter_numerics(psh, '40%-50%')
         psh = inlist(psh, 'MONTH', months, inverse=True)
         psh['File'] = self.path
-        psh = try_numeric(psh)
+
+        psh_dtypes = dict.fromkeys(psh_cols[2:7], 'float64')
+        psh_dtypes.update(dict.fromkeys(psh_cols[8:], 'int'))
+        psh_dtypes.update(dict.fromkeys(
+            ['MONTH', 'SUM/PEAK', 'MEASUREMENT TYPE', 'Object', 'File'], 'string'))
+        psh = apply_schema(psh, psh_dtypes)
         return psh
 
+    @memoize_report
     def lvb(self):
         lvb_col_pat = '%PACE                         MULTIP%IER  %YPE % AZIM %SQFT ) %EOPLE  %QFT )%      METHOD % ACH   % (SQFT )   %  (CUFT %'
         lvb_cols = ['SPACE',
@@ -510,9 +823,14 @@ class RptHandler:
         lvb = lvb.loc[lvb['SPACE*FLOOR MULTIPLIER'].notnull(), :]
         lvb = filter_numerics(lvb, 'SPACE*FLOOR MULTIPLIER')
         lvb['File'] = self.path
-        lvb = try_numeric(lvb)
+
+        lvb_dtypes = dict.fromkeys(lvb_cols, 'float64')
+        lvb_dtypes.update(dict.fromkeys(
+            ['SPACE', 'SPACE TYPE', 'INFILTRATION METHOD', 'Object', 'File'], 'string'))
+        lvb = apply_schema(lvb, lvb_dtypes)
         return lvb
 
+    @memoize_report
     def bepu(self):  # value       lights     task       eq      htg     clg      ht      pumps     fans      ref     ht p      dhw      ext      total
         # bepu_col_pat = '%           %---------  %------%  ------  %------%  ------  %------% ------%   ------  %------  % -----   %------  %-----%  -------%'
 
@@ -568,7 +886,10 @@ class RptHandler:
 
         bepu['Utility'] = get_utils(bepu.index)
 
-        bepu = try_numeric(bepu)
+        bepu_dtypes = dict.fromkeys(bepu_cols[1:], 'float64')
+        bepu_dtypes.update(dict.fromkeys(
+            ['Value', 'Meter', 'Utility', 'Object', 'File'], 'string'))
+        bepu = apply_schema(bepu, bepu_dtypes)
 
         bepu = bepu[[
 
@@ -593,6 +914,7 @@ class RptHandler:
 
         return bepu
 
+    @memoize_report
     def unmet(self):
         unmetlist = self._make_dirty_rpt_list('beps')
         unmetlist = [[y.strip() for y in x.split("=")] for x in unmetlist['None']
@@ -622,6 +944,7 @@ class RptHandler:
 
         return unmet_df, cool_ssr, heat_ssr
 
+    @memoize_report
     def beps(self):
         beps_col_pat = '%            %-------  %------  %------ %-------  %------  %------  %------  %------  %------  %------  %------  %------  %------%'
         beps_cols = ['Value',
@@ -678,7 +1001,10 @@ class RptHandler:
                     utilcols.append('Chilled-Water')
             return utilcols
 
-        beps = try_numeric(beps)
+        beps_dtypes = dict.fromkeys(beps_cols[1:], 'float64')
+        beps_dtypes.update(dict.fromkeys(
+            ['Value', 'Meter', 'Object', 'File'], 'string'))
+        beps = apply_schema(beps, beps_dtypes)
         beps['Utility'] = get_utils(beps.index)
 
         beps = beps[[
@@ -704,6 +1030,7 @@ class RptHandler:
 
         return beps
 
+    @memoize_report
     def ssg(self, keepcols=True):
         ssa_col_pat = '%    %  -COOLING  %  T%ME % DRY-% WET- %     COOLING    %   HEATING %   %IME % DRY- %WET- %     HEATING %      TRICAL  %    ELE%'
 
@@ -748,10 +1075,15 @@ class RptHandler:
         if keepcols:
             ssg = ssg[keepcols]
 
-        ssg = try_numeric(ssg)
+        ssg_dtypes = dict.fromkeys(ssg_cols[1:], 'float64')
+        ssg_dtypes.update(dict.fromkeys(
+            [col for col in ssg_cols if 'Time Of Max' in col], 'int'))
+        ssg_dtypes.update(dict.fromkeys(['Month', 'File', 'Object'], 'string'))
+        ssg = apply_schema(ssg, ssg_dtypes)
 
         return ssg
 
+    @memoize_report
     def ssa(self, keepcols=True):
         ssa_col_pat = '%    %  -COOLING  %  T%ME % DRY-% WET- %     COOLING    %   HEATING %   %IME % DRY- %WET- %     HEATING %      TRICAL  %    ELE%'
         ssa_cols = [
@@ -791,10 +1123,15 @@ class RptHandler:
         if keepcols:
             ssa = ssa[keepcols]
 
-        ssa = try_numeric(ssa)
+        ssa_dtypes = dict.fromkeys(ssa_cols[1:], 'float64')
+        ssa_dtypes.update(dict.fromkeys(
+            [col for col in ssa_cols if 'Time Of Max' in col], 'int'))
+        ssa_dtypes.update(dict.fromkeys(['Month', 'File', 'Object'], 'string'))
+        ssa = apply_schema(ssa, ssa_dtypes)
 
         return ssa
 
+    @memoize_report
     def ssb(self, keepcols=True):
         ssb_col_pat = '%ONTH%       (MBTU)%     (KBTU/HR)%        (MBTU)%     (KBTU/HR)%        (MBTU)%     (KBTU/HR)%        (MBTU)%     (KBTU/HR%'
         ssb_cols = [
@@ -831,10 +1168,13 @@ class RptHandler:
         if keepcols:
             ssb = ssb[keepcols]
 
-        ssb = try_numeric(ssb)
+        ssb_dtypes = dict.fromkeys(ssb_cols[1:], 'float64')
+        ssb_dtypes.update(dict.fromkeys(['Month', 'File', 'Object'], 'string'))
+        ssb = apply_schema(ssb, ssb_dtypes)
 
         return ssb
 
+    @memoize_report
     def ese(self):
         ese_col_pat = '%----  %-------  %-------  %-------  %-------  %------  %------  %------  %------  %------  %------  %------  %------  %------%'
         ese_cols = [
@@ -873,8 +1213,12 @@ class RptHandler:
             ratedict[key] = ratelist
 
         ese['Meters'] = ese['Object'].apply(lambda x: ratedict[x])
-        return try_numeric(ese)
 
+        ese_dtypes = dict.fromkeys(ese_cols[1:], 'float64')
+        ese_dtypes.update(dict.fromkeys(['Month', 'Object', 'File'], 'string'))
+        return apply_schema(ese, ese_dtypes)
+
+    @memoize_report
     def ratedict(self):
         ratelist = self._make_dirty_rpt_list("ese")
         ratedict = {}
@@ -888,6 +1232,7 @@ class RptHandler:
                 ratedict[rate] = key
         return ratedict
 
+    @memoize_report
     def lsb(self='self'):
         lsb_col_pat = '%                           %-------   % -----  %------- % -----                     %-------  %------%'
         lsb_cols = ['Nothing',
@@ -932,7 +1277,10 @@ class RptHandler:
                    'TOTAL']
 
         lsb = inlist(lsb, 'LOAD COMPONENT', rowlist, inverse=True)
-        lsb = try_numeric(lsb)
+        lsb_dtypes = dict.fromkeys(lsb_cols[2:8], 'float64')
+        lsb_dtypes.update(dict.fromkeys(
+            ['LOAD COMPONENT', 'Space', 'Object'], 'string'))
+        lsb = apply_schema(lsb, lsb_dtypes)
         lsb['File'] = self.path
         lsb['COOLING TOTAL KBTU/H'] = lsb['COOLING SENSIBLE KBTU/H'] + \
             lsb['COOLING LATENT KBTU/H']
@@ -959,6 +1307,7 @@ class RptHandler:
 
         return lsb
 
+    @memoize_report
     def lsd(self='self'):
         lsd_col_pat = '%ONTH%    (MBTU)%  DY% HR%  TEMP% TEMP%    (KBTU/HR)%        (MBTU)%  DY% HR%  TEMP% TEMP%    (KBTU/HR)%        (KWH)%      (KW)%'
 
@@ -989,12 +1338,15 @@ class RptHandler:
         lsd = lsd.set_index('MONTH', drop=True)
         lsd.Object = 'Building'
 
-        for col in lsd.columns:
-            lsd[col] = lsd[col].apply(lambda x: x.replace('.F', ''))
-
-        lsd = try_numeric(lsd)
+        # temperatures carry trailing '.F', handled by apply_schema
+        lsd_dtypes = dict.fromkeys(lsd_cols[1:], 'float64')
+        lsd_dtypes.update(dict.fromkeys(
+            [col for col in lsd_cols if 'TIME OF MAX' in col], 'int'))
+        lsd_dtypes['Object'] = 'string'
+        lsd = apply_schema(lsd, lsd_dtypes)
         return lsd
 
+    @memoize_report
     def ssd(self='self'):
         ssd_col_pat = '%ONTH%    (MBTU)%  DY% HR%  TEMP% TEMP%    (KBTU/HR)%        (MBTU)%  DY% HR%  TEMP% TEMP%    (KBTU/HR)%        (KWH)%      (KW)%'
 
@@ -1025,12 +1377,15 @@ class RptHandler:
         ssd = ssd.set_index('MONTH', drop=True)
         ssd.Object = 'Building'
 
-        for col in ssd.columns:
-            ssd[col] = ssd[col].apply(lambda x: x.replace('.F', ''))
-
-        ssd = try_numeric(ssd)
+        # temperatures carry trailing '.F', handled by apply_schema
+        ssd_dtypes = dict.fromkeys(ssd_cols[1:], 'float64')
+        ssd_dtypes.update(dict.fromkeys(
+            [col for col in ssd_cols if 'TIME OF MAX' in col], 'int'))
+        ssd_dtypes['Object'] = 'string'
+        ssd = apply_schema(ssd, ssd_dtypes)
         return ssd
 
+    @memoize_report
     def lse(self='self'):
 
         lse_col_pat = '%   %HEATNG %   0.000  %  0.000 %   0.000 %  -0.939  %  0.000  %  0.000  %  0.000  %  0.080  %  0.244   % 0.098  %  0.000  % -0.516%'
@@ -1046,10 +1401,15 @@ class RptHandler:
         lse['MONTH'] = lse['MONTH'].fillna(method='ffill')
         lse = lse.fillna(0)
         lse = lse.rename(columns={'Object': 'Space'})
-        lse = try_numeric(lse)
         lse['File'] = self.path
+
+        lse_dtypes = dict.fromkeys(lse_cols[2:], 'float64')
+        lse_dtypes.update(dict.fromkeys(
+            ['MONTH', 'TYPE', 'Space', 'File'], 'string'))
+        lse = apply_schema(lse, lse_dtypes)
         return lse
 
+    @memoize_report
     def sva(self='self'):
 
         sva_dirty = self._make_dirty_rpt_list('sv-a')
@@ -1155,9 +1515,9 @@ class RptHandler:
                 newdict[k] = newitemlist
             return newdict
 
-        sysdf = try_numeric(pd.DataFrame(cleanspaces(sysdict)).T)
-        fandf = try_numeric(pd.DataFrame(cleanspaces(fandict)).T)
-        zonedf = try_numeric(pd.concat(zonedict).reset_index())
+        sysdf = pd.DataFrame(cleanspaces(sysdict)).T
+        fandf = pd.DataFrame(cleanspaces(fandict)).T
+        zonedf = pd.concat(zonedict).reset_index()
 
         zonedf = zonedf.set_index('level_0')
         zonedf = zonedf.drop('level_1', axis=1)
@@ -1189,10 +1549,25 @@ class RptHandler:
         fandf['System'] = fandf.index
         zonedf['System'] = zonedf.index
 
+        sys_dtypes = dict.fromkeys(sysinfocols, 'float64')
+        sys_dtypes.update(dict.fromkeys(['System Type', 'File', 'System'], 'string'))
+        fan_dtypes = dict.fromkeys(faninfocols, 'float64')
+        fan_dtypes.update(dict.fromkeys(
+            [col for col in faninfocols if col.split('_', 1)[1] in
+             ['Fan Type', 'Fan Placement', 'Fan Control']], 'string'))
+        fan_dtypes.update(dict.fromkeys(['File', 'System'], 'string'))
+        zone_dtypes = dict.fromkeys(zoneinfocols, 'float64')
+        zone_dtypes.update(dict.fromkeys(['Zn Name', 'File', 'System'], 'string'))
+
+        sysdf = apply_schema(sysdf, sys_dtypes)
+        fandf = apply_schema(fandf, fan_dtypes)
+        zonedf = apply_schema(zonedf, zone_dtypes)
+
         systemdf = pd.concat([sysdf, fandf], axis=1)
 
         return systemdf, zonedf
 
+    @memoize_report
     def sspcool(self):
         sspcool = self._make_dirty_rpt_list('SS-P COOLING')
         sspcooldict = {}
@@ -1237,13 +1612,17 @@ class RptHandler:
                 'Fan Energy Peak (kW)': fanenergy_peak
             }
 
-        sspcooldf = try_numeric(pd.DataFrame(sspcooldict).T)
+        sspcooldf = pd.DataFrame(sspcooldict).T
+        sspcool_dtypes = dict.fromkeys(sspcooldf.columns, 'float64')
+        sspcool_dtypes['Unit Type'] = 'string'
+        sspcooldf = apply_schema(sspcooldf, sspcool_dtypes)
         sspcooldf['Object'] = sspcooldf.index
         sspcooldf['File'] = self.path
         sspcooldf['rptname'] = 'SSP_COOL'
         sspcooldf = sspcooldf.reset_index(drop=True)
         return sspcooldf
 
+    @memoize_report
     def sspheat(self):
         sspheat = self._make_dirty_rpt_list('SS-P HEATING')
 
@@ -1288,7 +1667,10 @@ class RptHandler:
                 'Fan Energy Peak (kW)': fanenergy_peak
             }
 
-        sspheatdf = try_numeric(pd.DataFrame(sspheatdict).T)
+        sspheatdf = pd.DataFrame(sspheatdict).T
+        sspheat_dtypes = dict.fromkeys(sspheatdf.columns, 'float64')
+        sspheat_dtypes['Unit Type'] = 'string'
+        sspheatdf = apply_schema(sspheatdf, sspheat_dtypes)
         sspheatdf['Object'] = sspheatdf.index
         sspheatdf['File'] = self.path
         sspheatdf['rptname'] = 'SSP_HEAT'
@@ -1296,6 +1678,7 @@ class RptHandler:
 
         return sspheatdf
 
+    @memoize_report
     def ssqcool(self):
 
         ssqcool = self._make_dirty_rpt_list('SS-Q HEAT PUMP COOLING')
@@ -1343,7 +1726,9 @@ class RptHandler:
                 'CSPF (WITHOUT PARASITICS)': cspfwithoutparasitics
             }
 
-        ssqcooldf = try_numeric(pd.DataFrame(ssqcooldict).T)
+        ssqcooldf = pd.DataFrame(ssqcooldict).T
+        ssqcool_dtypes = dict.fromkeys(ssqcooldf.columns, 'float64')
+        ssqcooldf = apply_schema(ssqcooldf, ssqcool_dtypes)
 
         ssqcooldf['Object'] = ssqcooldf.index
 
@@ -1355,6 +1740,7 @@ class RptHandler:
 
         return ssqcooldf
 
+    @memoize_report
     def ssqheat(self):
 
         ssqheat = self._make_dirty_rpt_list('SS-Q HEAT PUMP HEATING')
@@ -1404,7 +1790,9 @@ class RptHandler:
 
             }
 
-        ssqheatdf = try_numeric(pd.DataFrame(ssqheatdict).T)
+        ssqheatdf = pd.DataFrame(ssqheatdict).T
+        ssqheat_dtypes = dict.fromkeys(ssqheatdf.columns, 'float64')
+        ssqheatdf = apply_schema(ssqheatdf, ssqheat_dtypes)
         ssqheatdf['Object'] = ssqheatdf.index
         ssqheatdf['File'] = self.path
         ssqheatdf['rptname'] = 'SSQ_HEAT'
@@ -1413,81 +1801,57 @@ class RptHandler:
 
         return ssqheatdf
 
+    @memoize_report
     def hourly(self='self'):
-
-        with open(self.path) as f:
-            fstr = f.read()
-
-        pages_raw = [x.split('\n') for x in fstr.split('\f')]
-        pages_raw = [x for x in pages_raw if len(x) > 1]
-
-        pages = [x for x in pages_raw if "HOURLY REPORT" in x[2]]
-
-        hourlydict = {}
-        for page in pages:
-            columns = page[4:11]
-            rows = page[11:35]
-
-            spacingrow = columns[-1]
-
-            # attempt to add delimeters by both "----( 7)" and "----302-". other conditions?
-            spacingrow = spacingrow.replace(
-                "----(", "%---(").replace("----", "%--(")
-
-            poslist = [i for i, letter in enumerate(
-                spacingrow) if letter == '%']
-            poslist.append(len(spacingrow))
-
-            # get columns
-            parsed_cols = []
-            for col in columns:
-                parsed_col = []
-                lastpos = poslist[0]
-                for pos in poslist[1:]:
-                    parsed_col.append(col[lastpos:pos].strip())
-                    lastpos = pos
-                parsed_cols.append(parsed_col)
-
-            col_df_transposed = pd.DataFrame(parsed_cols).T.values
-            cols = ['_'.join(x).replace('__', '_').replace(
-                "----( ", "(") for x in col_df_transposed]
-
-            # testing column parsing
-            # if "ERV" in ''.join(cols):
-            # print(cols[5:])
-
-            # get data values and date index
-            for row in rows:
-                date = row[:6]
-
-                rowsplit = re.split(r'\s{2,}', row)
-
-                date = rowsplit[0]
-
-                vals = rowsplit[1:]
-
-                for num, val in enumerate(vals):
-                    colname = cols[num]
-                    if colname in hourlydict:
-                        hourlydict[colname][date] = val
-                    else:
-                        hourlydict[colname] = {}
-                        hourlydict[colname][date] = val
-
-        df = pd.DataFrame.from_dict(hourlydict)
-        df = try_numeric(df)
-
-        df['dt'] = df.index
-
-        df['dt'] = df['dt'].apply(lambda x: str(x).replace(' ', '0'))
-        df['month'] = df['dt'].apply(lambda x: x[:2])
-        df['day'] = df['dt'].apply(lambda x: x[2:4])
-        df['hour'] = df['dt'].apply(lambda x: x[4:6])
-
-        df['year'] = '2021'
-        dtindex = pd.to_datetime(df[['year', 'month', 'day', 'hour']])
-
-        df = df.set_index(dtindex)
-        df = df.drop(['dt', 'year', 'month', 'day', 'hour'], axis=1)
-
+        '''
+        returns dataframe of all HOURLY REPORT blocks, one column per
+        variable, indexed by timestamp (hour ending, year 2021)
+        '''
+        self._check_selected('HOURLY REPORT')
+        self._scan()
+
+        # group pages by their column header; each page holds up to 24
+        # rows of one report block, written into preallocated arrays per
+        # group
+        groups = {}
+        for span in self._hourly:
+            lines = report_lines(self._buf, self._linestarts, [span], self.encoding)
+            header = tuple(lines[0:7])
+            # short pages (e.g. the last one) end before 24 rows; skip the
+            # form feed and any other lines that aren't data rows
+            rows = [row for row in lines[7:31].tolist()
+                    if hourly_stamp.match(row)]
+            if len(rows) > 0:
+                groups.setdefault(header, []).append(rows)
+
+        frames = []
+        for header, pages in groups.items():
+            cols = hourly_columns(header)
+            nrows = sum(len(rows) for rows in pages)
+            values = np.full((nrows, len(cols)), np.nan)
+            dates = np.zeros(nrows, dtype=np.int64)
+            pos = 0
+            for rows in pages:
+                block = [row[6:].split()[:len(cols)] for row in rows]
+                try:
+                    values[pos:pos + len(rows)] = np.array(block, dtype=float)
+                except ValueError:
+                    # ragged rows or unparseable values ('****', etc.)
+                    block = pd.DataFrame(block).apply(coerce_numeric).values
+                    values[pos:pos + len(rows), :block.shape[1]] = block
+                dates[pos:pos + len(rows)] = [
+                    int(row[:6].replace(' ', '0')) for row in rows]
+                pos += len(rows)
+            frames.append(pd.DataFrame(values, index=dates, columns=cols))
+
+        if len(frames) == 0:
+            return pd.DataFrame(index=pd.DatetimeIndex([]))
+
+        df = pd.concat(frames, axis=1, sort=True)
+        if not df.columns.is_unique:
+            # same variable reported in more than one block
+            df = df.T.groupby(level=0, sort=False).last().T
+
+        keys = df.index.values
+        df.index = hourly_index(keys // 10000, keys // 100 % 100, keys % 100)
         return df
@@ -0,0 +1,75 @@
+'''
+regression tests for RptHandler.hourly on generated sim files
+'''
+
+import pytest
+
+from eqparse.sim.sim import RptHandler
+
+
+NAMES = [('GLOBAL', 'DRY BULB', 'TEMP'), ('GLOBAL', 'WET BULB', 'TEMP'),
+         ('SYS-1', 'FAN', 'KW'), ('SYS-1', 'SUPPLY', 'FLOW'),
+         ('PLANT', 'CHILLER', 'LOAD')]
+
+
+def hourly_page(day, hours):
+    '''returns text of one hourly report page of day (in january) holding
+    the given hours'''
+    lines = ['', '', 'HOURLY REPORT- Block1                    WEATHER FILE- TMY3', '']
+    for k in range(7):
+        row = '      '
+        for name in NAMES:
+            if k < 3:
+                row += '  ' + name[k].rjust(8)
+            elif k == 6:
+                row += '  ----( 7)'
+            else:
+                row += '          '
+        lines.append(row)
+    for hour in hours:
+        lines.append('%2d%2d%2d' % (1, day, hour) +
+                     ''.join('  %8.2f' % (day * 100 + hour + num / 10.)
+                             for num in range(len(NAMES))))
+    return '\f' + '\n'.join(lines + [''])
+
+
+def write_sim(path, pages):
+    with open(path, 'w', newline='') as f:
+        f.write(''.join(pages) + '\n')
+
+
+def test_hourly_full_pages(tmp_path):
+    path = str(tmp_path / 'full.SIM')
+    write_sim(path, [hourly_page(day, range(1, 25)) for day in (1, 2, 3)])
+    with RptHandler(path) as sim:
+        df = sim.hourly()
+    assert df.shape == (72, 5)
+    assert df.index[0].hour == 1 and df.index[-1].day == 4
+    assert df.iloc[0, 0] == 101.0
+
+
+def test_hourly_short_last_page(tmp_path):
+    # last page stops after 12 hours and is followed by non-data lines,
+    # which used to be parsed as rows
+    path = str(tmp_path / 'short.SIM')
+    pages = [hourly_page(day, range(1, 25)) for day in (1, 2)]
+    pages.append(hourly_page(3, range(1, 13)) + '\n  END OF HOURLY REPORTS\n')
+    write_sim(path, pages)
+    with RptHandler(path) as sim:
+        df = sim.hourly()
+    assert df.shape == (60, 5)
+    assert not df.isnull().values.any()
+    assert df.iloc[-1, 0] == 312.0
+
+
+def test_hourly_excluded(tmp_path):
+    # hourly left out by exclude raises rather than returning an empty
+    # frame, and nothing is cached that a later full handler would read
+    path = str(tmp_path / 'full.SIM')
+    cache_dir = str(tmp_path / 'cache')
+    write_sim(path, [hourly_page(day, range(1, 25)) for day in (1, 2, 3)])
+    with RptHandler(path, cache_dir=cache_dir, exclude=['HOURLY']) as sim:
+        with pytest.raises(ValueError):
+            sim.hourly()
+    with RptHandler(path, cache_dir=cache_dir) as sim:
+        assert sim.hourly().shape == (72, 5)